@@ -0,0 +1,275 @@
+import io
+import os
+import threading
+from collections import defaultdict
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from database import engine
+from rollups import rating_bucket
+
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "postgres")
+ANALYTICS_ENGINES = dict(
+    entry.strip().split("=", 1) for entry in os.getenv("ANALYTICS_ENGINES", "").split(",") if "=" in entry
+)
+ANALYTICS_SOURCE = os.getenv("ANALYTICS_SOURCE", "postgres")
+ANALYTICS_COMPACT_ROWS = int(os.getenv("ANALYTICS_COMPACT_ROWS", "10000"))
+
+ENDPOINTS = ("rating_distribution", "release_trend", "update_trend", "average_rating")
+
+APP_COLUMNS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("category_id", pa.int32()),
+    ("rating", pa.float64()),
+    ("price", pa.float64()),
+    ("installs", pa.int64()),
+    ("content_rating", pa.string()),
+    ("free", pa.bool_()),
+    ("ad_supported", pa.bool_()),
+    ("in_app_purchases", pa.bool_()),
+    ("editors_choice", pa.bool_()),
+    ("released", pa.date32()),
+    ("last_updated", pa.date32()),
+])
+
+# mirrors filtering.apply_filters, including its skipping of falsy values
+FILTER_CONDITIONS = [
+    ("min_rating", "rating", ">="),
+    ("max_rating", "rating", "<="),
+    ("min_price", "price", ">="),
+    ("max_price", "price", "<="),
+    ("min_installs", "installs", ">="),
+    ("max_installs", "installs", "<="),
+    ("content_rating", "content_rating", "="),
+    ("free", "free", "="),
+    ("ad_supported", "ad_supported", "="),
+    ("in_app_purchases", "in_app_purchases", "="),
+    ("editors_choice", "editors_choice", "="),
+]
+
+TREND_COLUMNS = {"release": "released", "update": "last_updated"}
+
+
+def engine_for(endpoint: str) -> str:
+    return ANALYTICS_ENGINES.get(endpoint, ANALYTICS_ENGINE)
+
+
+def enabled(endpoint: str) -> bool:
+    return engine_for(endpoint) != "postgres"
+
+
+def any_enabled() -> bool:
+    return any(enabled(endpoint) for endpoint in ENDPOINTS)
+
+
+def filter_conditions(filters: dict, category_id: int = None) -> list:
+    conditions = [("category_id", "=", category_id)] if category_id else []
+    for key, column, operator in FILTER_CONDITIONS:
+        if filters.get(key):
+            conditions.append((column, operator, filters[key]))
+    return conditions
+
+
+def copy_out(cursor, copy_sql: str) -> bytes:
+    buffer = io.BytesIO()
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(copy_sql, buffer)
+    else:
+        with cursor.copy(copy_sql) as copy:
+            for data in copy:
+                buffer.write(data)
+    return buffer.getvalue()
+
+
+def load_from_postgres() -> pa.Table:
+    columns = ", ".join(APP_COLUMNS_SCHEMA.names)
+    connection = engine.raw_connection()
+    try:
+        data = copy_out(connection.cursor(), f"COPY (SELECT {columns} FROM apps) TO STDOUT WITH (FORMAT csv, HEADER)")
+    finally:
+        connection.close()
+    return pacsv.read_csv(
+        io.BytesIO(data),
+        convert_options=pacsv.ConvertOptions(
+            column_types=APP_COLUMNS_SCHEMA,
+            true_values=["t"],
+            false_values=["f"],
+        ),
+    ).select(APP_COLUMNS_SCHEMA.names)
+
+
+def load_from_parquet() -> pa.Table:
+    from columnar import read_apps
+    return read_apps(APP_COLUMNS_SCHEMA.names).select(APP_COLUMNS_SCHEMA.names).cast(APP_COLUMNS_SCHEMA)
+
+
+def snapshot_app(db_app) -> dict:
+    return {name: getattr(db_app, name) for name in APP_COLUMNS_SCHEMA.names}
+
+
+class AppColumnStore:
+    # API writes land in an overlay keyed by app id, None marking a deleted app, which is folded
+    # into the base table once it grows past ANALYTICS_COMPACT_ROWS
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._base = None
+        self._overlay = {}
+        self._view = None
+
+    def table(self) -> pa.Table:
+        with self._lock:
+            if self._base is None:
+                self._base = self._loader()
+                self._overlay = {}
+            if self._view is None:
+                self._view = self._merge()
+            return self._view
+
+    def _merge(self) -> pa.Table:
+        if not self._overlay:
+            return self._base
+        replaced = pa.array(list(self._overlay), pa.int64())
+        kept = self._base.filter(pc.invert(pc.is_in(self._base["id"], value_set=replaced)))
+        rows = [row for row in self._overlay.values() if row is not None]
+        return pa.concat_tables([kept, pa.Table.from_pylist(rows, schema=APP_COLUMNS_SCHEMA)])
+
+    def _write(self, app_id: int, row: Optional[dict]):
+        with self._lock:
+            if self._base is None:
+                return
+            self._overlay[app_id] = row
+            self._view = None
+            if len(self._overlay) >= ANALYTICS_COMPACT_ROWS:
+                self._base = self._merge()
+                self._overlay = {}
+
+    def upsert(self, row: dict):
+        self._write(row["id"], row)
+
+    def delete(self, app_id: int):
+        self._write(app_id, None)
+
+    def clear_category(self, category_id: int):
+        # deleting a category sets apps.category_id to NULL
+        with self._lock:
+            if self._base is None:
+                return
+            base = self._merge()
+            column = base["category_id"]
+            cleared = pc.if_else(pc.equal(column, category_id), pa.scalar(None, pa.int32()), column)
+            self._base = base.set_column(base.schema.get_field_index("category_id"), "category_id", cleared)
+            self._overlay = {}
+            self._view = None
+
+    def reload(self):
+        with self._lock:
+            self._base = None
+            self._overlay = {}
+            self._view = None
+
+
+class ArrowEngine:
+    @staticmethod
+    def _filter(table: pa.Table, conditions: list, not_null: str = None) -> pa.Table:
+        operators = {">=": pc.greater_equal, "<=": pc.less_equal, "=": pc.equal}
+        mask = pc.is_valid(pc.field(not_null)) if not_null else None
+        for column, operator, value in conditions:
+            condition = operators[operator](pc.field(column), value)
+            mask = condition if mask is None else mask & condition
+        return table if mask is None else table.filter(mask)
+
+    def rating_distribution(self, table: pa.Table, conditions: list) -> list:
+        ratings = self._filter(table, conditions, "rating").select(["rating"])
+        counts = ratings.group_by("rating").aggregate([([], "count_all")]).sort_by("rating")
+        return list(zip(counts["rating"].to_pylist(), counts["count_all"].to_pylist()))
+
+    def year_trend(self, table: pa.Table, column: str, conditions: list) -> list:
+        years = pa.table({"year": pc.year(self._filter(table, conditions, column)[column])})
+        counts = years.group_by("year").aggregate([([], "count_all")]).sort_by("year")
+        return list(zip(counts["year"].to_pylist(), counts["count_all"].to_pylist()))
+
+    def average_rating(self, table: pa.Table, conditions: list) -> Optional[float]:
+        return pc.mean(self._filter(table, conditions)["rating"]).as_py()
+
+
+class DuckDBEngine:
+    def __init__(self):
+        import duckdb
+        self._connection = duckdb.connect()
+        self._lock = threading.Lock()
+        self._table = None
+
+    def _query(self, table: pa.Table, select: str, conditions: list, not_null: str = None, tail: str = "") -> list:
+        where = [f"{column} {operator} ?" for column, operator, _ in conditions]
+        if not_null:
+            where.append(f"{not_null} IS NOT NULL")
+        sql = f"SELECT {select} FROM apps {'WHERE ' + ' AND '.join(where) if where else ''} {tail}"
+        with self._lock:
+            # the store hands out a new table after every write, registering it is zero-copy
+            if table is not self._table:
+                self._connection.register("apps", table)
+                self._table = table
+            return self._connection.execute(sql, [value for _, _, value in conditions]).fetchall()
+
+    def rating_distribution(self, table: pa.Table, conditions: list) -> list:
+        return self._query(table, "rating, COUNT(*)", conditions, "rating", "GROUP BY rating ORDER BY rating")
+
+    def year_trend(self, table: pa.Table, column: str, conditions: list) -> list:
+        return self._query(table, f"year({column}) AS year, COUNT(*)", conditions, column,
+                           "GROUP BY year ORDER BY year")
+
+    def average_rating(self, table: pa.Table, conditions: list) -> Optional[float]:
+        return self._query(table, "AVG(rating)", conditions)[0][0]
+
+
+app_store = AppColumnStore(load_from_parquet if ANALYTICS_SOURCE == "parquet" else load_from_postgres)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name: str):
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = DuckDBEngine() if name == "duckdb" else ArrowEngine()
+        return _engines[name]
+
+
+def rating_distribution(filters: dict, category_id: int = None) -> List[dict]:
+    result = get_engine(engine_for("rating_distribution")).rating_distribution(
+        app_store.table(), filter_conditions(filters, category_id))
+    # the engines group by the stored rating; merged into the rounded buckets of RATING_BUCKET and app_rating_stats
+    counts = defaultdict(int)
+    for rating, count in result:
+        counts[rating_bucket(rating)] += count
+    return [{"rating": float(bucket), "count": count} for bucket, count in sorted(counts.items())]
+
+
+def year_trend(kind: str, category_id: int = None) -> List[dict]:
+    result = get_engine(engine_for(f"{kind}_trend")).year_trend(
+        app_store.table(), TREND_COLUMNS[kind], filter_conditions({}, category_id))
+    return [{"year": int(year), "count": count} for year, count in result]
+
+
+def average_rating(category_id: int = None) -> Optional[float]:
+    return get_engine(engine_for("average_rating")).average_rating(
+        app_store.table(), filter_conditions({}, category_id))
+
+
+def app_saved(db_app):
+    if any_enabled():
+        app_store.upsert(snapshot_app(db_app))
+
+
+def app_deleted(app_id: int):
+    if any_enabled():
+        app_store.delete(app_id)
+
+
+def category_deleted(category_id: int):
+    if any_enabled():
+        app_store.clear_category(category_id)
@@ -0,0 +1,445 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Query, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from models import FilterModel, AppModel, CategoryModel, DeveloperModel, StatisticRequestModel
+from database import get_async_db
+from entities import Category, App, Developer
+from filtering import apply_filters, load_filters, load_category_ids
+from pagination import APP_SORT_COLUMNS, DEVELOPER_SORT_COLUMNS, resolve_sort_column, keyset_segments, \
+    fetch_keyset_rows_async, split_keyset_page, decode_cursor
+from counting import count_rows
+from cache import filters_cache, category_ids_cache
+from serialization import OrjsonResponse, parse_fields, app_columns, rows_to_dicts
+import rollups
+import analytics
+import column_store
+import search
+import histogram
+import statistics_batch
+from histogram import RATING_BUCKET
+
+router = APIRouter()
+
+
+@router.get("/filters", response_model=FilterModel)
+async def get_filters_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    filter_model, etag = await db.run_sync(lambda session: filters_cache.get(lambda: load_filters(session)))
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=filter_model.model_dump(), headers={"ETag": etag})
+
+
+@router.get("/apps", response_model=dict)
+async def get_filtered_apps_async(
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        page: Optional[int] = Query(1, ge=1),
+        per_page: Optional[int] = Query(100, ge=1),
+        after: Optional[str] = Query(None),
+        sort_by: Optional[str] = Query("id"),
+        count_mode: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    fields = parse_fields(fields)
+
+    if column_store.APPS_COLUMN_STORE and (after is None or sort_by == "id"):
+        return await get_apps_from_column_store_async(db, filters, page, per_page, after, fields)
+
+    if after is not None:
+        sort_column = resolve_sort_column(App, sort_by, APP_SORT_COLUMNS)
+        statement = await apply_filters_to_query_async(select(*app_columns(fields, sort_by, "id")), filters, db)
+        rows = await fetch_keyset_rows_async(lambda segment: run_all(db, segment),
+                                             keyset_segments(statement, sort_column, App.id, after), per_page)
+        rows, next_cursor = split_keyset_page(rows, per_page, sort_by)
+        return OrjsonResponse({
+            "apps": rows_to_dicts(rows, fields),
+            "next_cursor": next_cursor,
+        })
+
+    statement = await apply_filters_to_query_async(select(*app_columns(fields)), filters, db)
+    offset = (page - 1) * per_page
+    rows = (await db.execute(statement.offset(offset).limit(per_page))).all()
+    total_apps, approximate = await db.run_sync(
+        lambda session: count_rows(session, statement, App.__tablename__, filters, count_mode))
+    total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
+
+    return OrjsonResponse({
+        "apps": rows_to_dicts(rows, fields),
+        "total_apps": total_apps,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": approximate,
+    })
+
+
+async def get_apps_from_column_store_async(db: AsyncSession, filters: dict, page: int, per_page: int,
+                                           after: Optional[str], fields: list):
+    category = filters["category"]
+    conditions = analytics.filter_conditions(filters, await get_category_id_async(db, category) if category else None)
+
+    if after is not None:
+        after_id = decode_cursor(after)[1] if after else 0
+        ids = await run_in_threadpool(column_store.app_store.page_after, conditions, after_id, per_page + 1)
+        rows, next_cursor = split_keyset_page(await load_app_rows_by_id_async(db, ids, fields), per_page, "id")
+        return OrjsonResponse({
+            "apps": rows_to_dicts(rows, fields),
+            "next_cursor": next_cursor,
+        })
+
+    ids, total_apps = await run_in_threadpool(column_store.app_store.page, conditions, (page - 1) * per_page, per_page)
+    total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
+    return OrjsonResponse({
+        "apps": rows_to_dicts(await load_app_rows_by_id_async(db, ids, fields), fields),
+        "total_apps": total_apps,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": False,
+    })
+
+
+async def load_app_rows_by_id_async(db: AsyncSession, ids: list, fields: list) -> list:
+    if not ids:
+        return []
+    return (await db.execute(select(*app_columns(fields, "id")).where(App.id.in_(ids)).order_by(App.id))).all()
+
+
+@router.get("/apps/search", response_model=dict)
+async def search_apps_async(
+        q: str = Query(..., min_length=search.SEARCH_MIN_LENGTH),
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        page: Optional[int] = Query(1, ge=1),
+        per_page: Optional[int] = Query(100, ge=1),
+        db: AsyncSession = Depends(get_async_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    statement = await apply_filters_to_query_async(select(App), filters, db)
+    page_statement, count_statement = search.search_statements(statement, q.strip(), (page - 1) * per_page, per_page)
+    apps = (await db.execute(page_statement)).scalars().all()
+    total_apps = (await db.execute(count_statement)).scalar()
+    total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
+
+    return {
+        "apps": [AppModel.from_orm(app) for app in apps],
+        "total_apps": total_apps,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": total_apps >= search.SEARCH_MAX_CANDIDATES,
+    }
+
+
+@router.get("/statistics/rating_distribution", response_model=List[dict])
+async def get_rating_distribution_async(
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    if analytics.enabled("rating_distribution"):
+        category_id = await get_category_id_async(db, category) if category else None
+        return await run_in_threadpool(analytics.rating_distribution, filters, category_id)
+
+    if rollups.STATISTICS_ROLLUP and not any(value for key, value in filters.items() if key != "category"):
+        category_id = await get_category_id_async(db, category) if category else None
+        return await db.run_sync(lambda session: rollups.rating_distribution(session, category_id))
+
+    statement = select(RATING_BUCKET, func.count().label('count')) \
+        .group_by(RATING_BUCKET) \
+        .order_by(RATING_BUCKET)
+
+    statement = await apply_filters_to_query_async(statement, filters, db)
+
+    result = (await db.execute(statement)).all()
+    return [{"rating": float(rating), "count": count} for rating, count in result]
+
+
+@router.get("/statistics/histogram", response_model=dict)
+async def get_histogram_async(
+        column: str = Query(..., pattern="^(rating|price|installs|size|rating_count)$"),
+        buckets: Optional[int] = Query(None, ge=1, le=histogram.HISTOGRAM_MAX_BUCKETS),
+        width: Optional[float] = Query(None, gt=0),
+        log: Optional[bool] = Query(None),
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    buckets = histogram.check_bins(buckets, width)
+    log = column in histogram.LOG_SCALE_COLUMNS if log is None else log
+    category_id = await get_category_id_async(db, category) if category else None
+    statement = histogram.histogram_statement(column, filters, category_id, buckets, width, log)
+    return histogram.histogram((await db.execute(statement)).all(), column, log)
+
+
+@router.post("/statistics/batch", response_model=List[dict])
+async def get_statistics_batch_async(statistics: List[StatisticRequestModel], db: AsyncSession = Depends(get_async_db)):
+    statistics_batch.check_size(statistics)
+    results = [None] * len(statistics)
+    for key, group in statistics_batch.group_by_filters(statistics).items():
+        filters = dict(key)
+        category_id = await get_category_id_async(db, filters["category"]) if filters.get("category") else None
+        computed = await statistics_batch.compute_async(db, {item.statistic for _, item in group}, filters,
+                                                        category_id)
+        for index, item in group:
+            results[index] = {"statistic": item.statistic, "filters": filters, "result": computed[item.statistic]}
+    return results
+
+
+@router.get("/statistics/release_trend", response_model=List[dict])
+async def get_app_release_trend_async(category_name: Optional[str] = None,
+                                      db: AsyncSession = Depends(get_async_db)):
+    if analytics.enabled("release_trend"):
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        return await run_in_threadpool(analytics.year_trend, "release", category_id)
+
+    if rollups.STATISTICS_ROLLUP:
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        return await db.run_sync(lambda session: rollups.year_trend(session, "release", category_id))
+
+    statement = select(func.extract('year', App.released).label('year'), func.count().label('count')) \
+        .group_by(func.extract('year', App.released)) \
+        .order_by('year')
+
+    statement = await apply_filters_to_query_async(statement, {"category": category_name}, db)
+
+    result = (await db.execute(statement)).all()
+    return [{"year": int(year), "count": count} for year, count in result]
+
+
+@router.get("/statistics/update_trend", response_model=List[dict])
+async def get_app_update_trend_async(category_name: Optional[str] = None,
+                                     db: AsyncSession = Depends(get_async_db)):
+    if analytics.enabled("update_trend"):
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        return await run_in_threadpool(analytics.year_trend, "update", category_id)
+
+    if rollups.STATISTICS_ROLLUP:
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        return await db.run_sync(lambda session: rollups.year_trend(session, "update", category_id))
+
+    statement = select(func.extract('year', App.last_updated).label('year'), func.count().label('count')) \
+        .group_by(func.extract('year', App.last_updated)) \
+        .order_by('year')
+
+    statement = await apply_filters_to_query_async(statement, {"category": category_name}, db)
+
+    result = (await db.execute(statement)).all()
+    return [{"year": int(year), "count": count} for year, count in result]
+
+
+@router.get("/statistics/average_rating/", response_model=dict)
+async def get_average_rating_async(category_name: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if analytics.enabled("average_rating"):
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        avg_rating = await run_in_threadpool(analytics.average_rating, category_id)
+        return {"category": category_name or "All", "average_rating": avg_rating}
+
+    if rollups.STATISTICS_ROLLUP:
+        category_id = await get_category_id_async(db, category_name) if category_name else None
+        avg_rating = await db.run_sync(lambda session: rollups.average_rating(session, category_id))
+        return {"category": category_name or "All", "average_rating": avg_rating}
+
+    statement = await apply_filters_to_query_async(select(func.avg(App.rating)), {"category": category_name}, db)
+
+    avg_rating = (await db.execute(statement)).scalar()
+    return {"category": category_name or "All", "average_rating": avg_rating}
+
+
+@router.get("/categories", response_model=List[CategoryModel])
+async def get_categories_async(db: AsyncSession = Depends(get_async_db)):
+    categories = (await db.execute(select(Category))).scalars().all()
+    return [CategoryModel.from_orm(category) for category in categories]
+
+
+@router.get("/categories/{category_id}", response_model=CategoryModel)
+async def get_category_async(category_id: int, db: AsyncSession = Depends(get_async_db)):
+    return CategoryModel.from_orm(await db.get(Category, category_id))
+
+
+@router.get("/developers", response_model=dict)
+async def get_developers_async(
+        page: Optional[int] = Query(1, ge=1),
+        per_page: Optional[int] = Query(10, ge=1),
+        after: Optional[str] = Query(None),
+        sort_by: Optional[str] = Query("id"),
+        count_mode: Optional[str] = Query(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    if after is not None:
+        sort_column = resolve_sort_column(Developer, sort_by, DEVELOPER_SORT_COLUMNS)
+        developers = await fetch_keyset_rows_async(lambda segment: run_scalars(db, segment),
+                                                   keyset_segments(select(Developer), sort_column, Developer.id, after),
+                                                   per_page)
+        developers, next_cursor = split_keyset_page(developers, per_page, sort_by)
+        return {
+            "developers": [DeveloperModel.from_orm(developer) for developer in developers],
+            "next_cursor": next_cursor,
+        }
+
+    total_developers, approximate = await db.run_sync(
+        lambda session: count_rows(session, select(Developer), Developer.__tablename__, {}, count_mode))
+    total_pages = (total_developers // per_page) + (1 if total_developers % per_page > 0 else 0)
+
+    offset = (page - 1) * per_page
+    developers = (await db.execute(select(Developer).offset(offset).limit(per_page))).scalars().all()
+
+    return {
+        "developers": [DeveloperModel.from_orm(developer) for developer in developers],
+        "total_developers": total_developers,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": approximate,
+    }
+
+
+@router.get("/developers/{developer_id}", response_model=DeveloperModel)
+async def get_developer_async(developer_id: int, db: AsyncSession = Depends(get_async_db)):
+    return DeveloperModel.from_orm(await db.get(Developer, developer_id))
+
+
+@router.get("/apps/{app_id}", response_model=AppModel)
+async def get_app_async(app_id: int, db: AsyncSession = Depends(get_async_db)):
+    return AppModel.from_orm(await db.get(App, app_id))
+
+
+async def run_all(db: AsyncSession, statement) -> list:
+    return (await db.execute(statement)).all()
+
+
+async def run_scalars(db: AsyncSession, statement) -> list:
+    return (await db.execute(statement)).scalars().all()
+
+
+async def get_category_id_async(db: AsyncSession, category_name: str) -> Optional[int]:
+    category_ids = await db.run_sync(lambda session: category_ids_cache.get(lambda: load_category_ids(session)))
+    category_id = category_ids.get(category_name)
+    if category_id is None:
+        # created by another process since the dictionary was loaded; an unknown name leaves the filter out
+        category_id = (await db.execute(select(Category.id).where(Category.name == category_name))).scalar()
+        if category_id is not None:
+            category_ids_cache.invalidate()
+    return category_id
+
+
+async def apply_filters_to_query_async(
+        statement,
+        filters: dict,
+        db: AsyncSession
+):
+    category_id = await get_category_id_async(db, filters.get("category")) if filters.get("category") else None
+    return apply_filters(statement, filters, category_id)
+
+
+def install_async_routes(app):
+    # replaces the sync route of every path and method the router defines; /apps/export, /suggest, /metrics, the
+    # admin routes and all writes keep their sync handlers (README section 5)
+    replaced = {(route.path, method) for route in router.routes for method in route.methods}
+    app.router.routes = [
+        route for route in app.router.routes
+        if not isinstance(route, APIRoute) or not any((route.path, method) in replaced for method in route.methods)
+    ]
+    app.include_router(router)
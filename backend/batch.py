@@ -0,0 +1,221 @@
+import os
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy import cast, column, delete, literal_column, text, update, values
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+
+from entities import App, Category, Developer
+import rollups
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+# the values create_app gives the columns a new app is created without
+APP_INSERT_DEFAULTS = {
+    "category_id": None,
+    "developer_id": None,
+    "rating": 0.0,
+    "rating_count": 0,
+    "installs": 0,
+    "min_installs": 0,
+    "max_installs": 0,
+    "free": True,
+    "price": 0.0,
+    "currency": "",
+    "size": 0.0,
+    "min_android": "",
+    "content_rating": "Unrated",
+    "ad_supported": False,
+    "in_app_purchases": False,
+    "editors_choice": False,
+}
+
+# true for a row the upsert inserted, false for one it updated
+INSERTED = literal_column("xmax = 0").label("inserted")
+
+_apps_partitioned = {}
+
+
+def check_size(items: list):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {BATCH_MAX_ITEMS} items")
+
+
+def run_batch(db, operation, items: list) -> tuple:
+    # a batch is one transaction, so a constraint violation by any item rolls back all of them
+    try:
+        outcome = operation(db, items)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e.orig).strip())
+    return outcome
+
+
+def group_by_fields(items: list, key: str) -> dict:
+    # items that set the same fields share one statement; an omitted field is left as it is on update. Items naming
+    # the same row are merged first, in request order, so the later one wins whichever group each would fall in
+    merged = {}
+    for item in items:
+        previous = merged.get(getattr(item, key))
+        merged[getattr(item, key)] = item if previous is None else \
+            previous.model_copy(update=item.model_dump(include=item.model_fields_set))
+    groups = {}
+    for index, item in enumerate(items):
+        item = merged[getattr(item, key)]
+        groups.setdefault(tuple(sorted(item.model_fields_set)), []).append((index, item))
+    return groups
+
+
+def update_from_values(db, table, fields: tuple, group: list) -> dict:
+    # UPDATE ... FROM (VALUES ...) changes every row of the group in one statement
+    names = [name for name in fields if name != "id"]
+    latest = {item.id: item for _, item in group}
+    data = values(*[column(name, table.c[name].type) for name in ["id"] + names], name="batch") \
+        .data([tuple(getattr(item, name) for name in ["id"] + names) for item in latest.values()])
+    # a VALUES column holding only NULLs is typed text, hence the casts back to the column types
+    statement = update(table).where(table.c.id == data.c.id) \
+        .values({name: cast(data.c[name], table.c[name].type) for name in names}).returning(*table.c)
+    return {row.id: row for row in db.execute(statement)}
+
+
+def snapshots(rows) -> list:
+    return [rollups.snapshot_app(row) for row in rows]
+
+
+def locked_apps(db, condition) -> list:
+    if not rollups.STATISTICS_ROLLUP:
+        return []
+    return db.execute(App.__table__.select().where(condition).with_for_update()).all()
+
+
+def check_upsert_supported(db):
+    # the partitioned layout has no unique index on app_id alone for ON CONFLICT (app_id) to use
+    if "apps" not in _apps_partitioned:
+        _apps_partitioned["apps"] = db.execute(
+            text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'apps'::regclass")).scalar()
+    if _apps_partitioned["apps"]:
+        raise HTTPException(status_code=501, detail="Upserting apps by app_id is not supported on the partitioned "
+                                                    "apps table, use PUT /apps/batch with ids instead")
+
+
+def upsert_apps(db, items: list) -> tuple:
+    check_size(items)
+    check_upsert_supported(db)
+    table = App.__table__
+    previous = locked_apps(db, table.c.app_id.in_({item.app_id for item in items}))
+    results = [None] * len(items)
+    saved = {}
+    for fields, group in group_by_fields(items, "app_id").items():
+        # ON CONFLICT cannot touch the same row twice in one statement, so each app_id is sent once
+        latest = {item.app_id: item for _, item in group}
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.app_id],
+            set_={name: statement.excluded[name] for name in fields if name != "app_id"},
+        ).returning(*table.c, INSERTED, sort_by_parameter_order=True)
+        defaults = {**APP_INSERT_DEFAULTS, "released": date.today(), "last_updated": date.today()}
+        rows = [{**defaults, **item.model_dump(include=set(fields))} for item in latest.values()]
+        returned = dict(zip(latest, db.execute(statement, rows).all()))
+        for index, item in group:
+            row = returned[item.app_id]
+            saved[row.id] = row
+            results[index] = {"index": index, "id": row.id, "status": "created" if row.inserted else "updated"}
+    rollups.apply_app_deltas(db, snapshots(previous), snapshots(saved.values()))
+    return results, list(saved.values())
+
+
+def update_apps(db, items: list) -> tuple:
+    check_size(items)
+    table = App.__table__
+    previous = locked_apps(db, table.c.id.in_({item.id for item in items}))
+    results = [None] * len(items)
+    saved = {}
+    for fields, group in group_by_fields(items, "id").items():
+        if fields == ("id",):
+            updated = {row.id: row for row in db.execute(table.select().where(
+                table.c.id.in_({item.id for _, item in group})))}
+        else:
+            updated = update_from_values(db, table, fields, group)
+        saved.update(updated)
+        for index, item in group:
+            results[index] = {"index": index, "id": item.id,
+                              "status": "updated" if item.id in updated else "not_found"}
+    rollups.apply_app_deltas(db, snapshots(previous), snapshots(saved.values()))
+    return results, list(saved.values())
+
+
+def delete_rows(db, table, ids: list) -> tuple:
+    check_size(ids)
+    deleted = db.execute(delete(table).where(table.c.id.in_(set(ids))).returning(*table.c)).all()
+    found = {row.id for row in deleted}
+    results = [{"index": index, "id": row_id, "status": "deleted" if row_id in found else "not_found"}
+               for index, row_id in enumerate(ids)]
+    return results, deleted
+
+
+def delete_apps(db, ids: list) -> tuple:
+    results, deleted = delete_rows(db, App.__table__, ids)
+    rollups.apply_app_deltas(db, snapshots(deleted), [])
+    return results, deleted
+
+
+def insert_categories(db, items: list) -> tuple:
+    check_size(items)
+    if not items:
+        return [], []
+    table = Category.__table__
+    names = list(dict.fromkeys(item.name for item in items))
+    statement = insert(table)
+    # the no-op update makes existing names come back with their id too
+    statement = statement.on_conflict_do_update(index_elements=[table.c.name], set_={"name": statement.excluded.name}) \
+        .returning(*table.c, INSERTED, sort_by_parameter_order=True)
+    returned = dict(zip(names, db.execute(statement, [{"name": name} for name in names]).all()))
+    results = [{"index": index, "id": returned[item.name].id,
+                "status": "created" if returned[item.name].inserted else "exists"}
+               for index, item in enumerate(items)]
+    return results, [row for row in returned.values() if row.inserted]
+
+
+def update_rows(db, table, items: list) -> tuple:
+    check_size(items)
+    results = [None] * len(items)
+    saved = {}
+    for fields, group in group_by_fields(items, "id").items():
+        updated = update_from_values(db, table, fields, group)
+        saved.update(updated)
+        for index, item in group:
+            results[index] = {"index": index, "id": item.id,
+                              "status": "updated" if item.id in updated else "not_found"}
+    return results, list(saved.values())
+
+
+def update_categories(db, items: list) -> tuple:
+    return update_rows(db, Category.__table__, items)
+
+
+def delete_categories(db, ids: list) -> tuple:
+    check_size(ids)
+    for category_id in set(ids):
+        rollups.reassign_category(db, category_id)
+    return delete_rows(db, Category.__table__, ids)
+
+
+def insert_developers(db, items: list) -> tuple:
+    check_size(items)
+    if not items:
+        return [], []
+    table = Developer.__table__
+    statement = insert(table).returning(*table.c, sort_by_parameter_order=True)
+    rows = db.execute(statement, [item.model_dump(include={"name", "email"}) for item in items]).all()
+    results = [{"index": index, "id": row.id, "status": "created"} for index, row in enumerate(rows)]
+    return results, rows
+
+
+def update_developers(db, items: list) -> tuple:
+    return update_rows(db, Developer.__table__, items)
+
+
+def delete_developers(db, ids: list) -> tuple:
+    return delete_rows(db, Developer.__table__, ids)
@@ -0,0 +1,103 @@
+import argparse
+import random
+import statistics
+import time
+
+from database import SessionLocal
+from entities import App, Category
+from filtering import apply_filters, load_filters
+from counting import exact_count
+from analytics import filter_conditions
+from column_store import app_store
+
+
+def random_filters(filter_model, rng: random.Random) -> dict:
+    # mimics the dashboard sliders: every filter is set or left open independently
+    def maybe(value):
+        return value if rng.random() < 0.5 else None
+
+    low_rating = rng.uniform(filter_model.min_rating, filter_model.max_rating)
+    low_installs = rng.randint(filter_model.min_installs, filter_model.max_installs // 100 or 1)
+    return {
+        "category": maybe(rng.choice(filter_model.categories)) if filter_model.categories else None,
+        "min_rating": maybe(round(low_rating, 1)),
+        "max_rating": maybe(round(rng.uniform(low_rating, filter_model.max_rating), 1)),
+        "min_price": None,
+        "max_price": maybe(round(rng.uniform(filter_model.min_price, 10.0), 2)),
+        "min_installs": maybe(low_installs),
+        "max_installs": None,
+        "content_rating": maybe(rng.choice(filter_model.content_ratings)) if filter_model.content_ratings else None,
+        "free": maybe(True),
+        "ad_supported": maybe(True),
+        "in_app_purchases": maybe(True),
+        "editors_choice": None,
+    }
+
+
+def category_ids(db) -> dict:
+    return {name: category_id for category_id, name in db.query(Category.id, Category.name)}
+
+
+def sql_page(db, filters: dict, category_id, per_page: int):
+    query = apply_filters(db.query(App), filters, category_id)
+    apps = query.limit(per_page).all()
+    return apps, exact_count(db, query.statement)
+
+
+def column_store_page(db, filters: dict, category_id, per_page: int):
+    ids, total = app_store.page(filter_conditions(filters, category_id), 0, per_page)
+    apps = db.query(App).filter(App.id.in_(ids)).order_by(App.id).all() if ids else []
+    return apps, total
+
+
+def timed(function, db, combinations: list, per_page: int) -> list:
+    timings = []
+    for filters, category_id in combinations:
+        start_time = time.perf_counter()
+        function(db, filters, category_id, per_page)
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return timings
+
+
+def report(name: str, timings: list):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+    print(f"{name:>13}: mean {statistics.mean(timings):8.2f} ms, median {statistics.median(timings):8.2f} ms, "
+          f"p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQL filtering of /apps with the in-memory column store")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rng = random.Random(args.seed)
+        filter_model, _ = load_filters(db)
+        ids_by_name = category_ids(db)
+        combinations = []
+        for _ in range(args.queries):
+            filters = random_filters(filter_model, rng)
+            combinations.append((filters, ids_by_name.get(filters["category"])))
+
+        start_time = time.perf_counter()
+        app_store.count([])
+        print(f"Column store loaded in {time.perf_counter() - start_time:.2f} seconds")
+
+        for filters, category_id in combinations[:10]:
+            _, sql_total = sql_page(db, filters, category_id, args.per_page)
+            _, store_total = column_store_page(db, filters, category_id, args.per_page)
+            if sql_total != store_total:
+                print(f"Count mismatch for {filters}: SQL {sql_total}, column store {store_total}")
+
+        report("sql", timed(sql_page, db, combinations, args.per_page))
+        report("column store", timed(column_store_page, db, combinations, args.per_page))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import random
+import re
+import time
+
+from sqlalchemy import func, select, text
+
+from database import SessionLocal
+from entities import App
+from search import search_statements, escape_like
+from benchmark_filters import report
+
+
+def make_queries(db, queries: int, rng: random.Random) -> list:
+    # each query is derived from a random app, which should then show up on the first page of its results
+    samples = db.query(App.id, App.app_name, App.app_id).order_by(func.random()).limit(queries).all()
+    workload = []
+    for app_id, name, package in samples:
+        words = [word for word in re.split(r"\W+", name) if len(word) >= 4]
+        segments = [segment for segment in package.split(".") if len(segment) >= 4]
+        if words:
+            word = rng.choice(words)
+            workload.append(("prefix", name[:max(4, len(name) // 2)], app_id))
+            workload.append(("word", word, app_id))
+            position = rng.randrange(len(word) - 1)
+            typo = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+            workload.append(("typo", typo, app_id))
+        if segments:
+            workload.append(("package", rng.choice(segments), app_id))
+    return workload
+
+
+def timed_search(db, q: str, per_page: int):
+    page, count = search_statements(select(App), q, 0, per_page)
+    start_time = time.perf_counter()
+    ids = [app.id for app in db.execute(page).scalars()]
+    db.execute(count).scalar()
+    return (time.perf_counter() - start_time) * 1000, ids
+
+
+def timed_scan(db, q: str, per_page: int) -> float:
+    # the naive ILIKE '%q%' the search replaces, with index scans disabled for this transaction only
+    db.execute(text("SET LOCAL enable_bitmapscan = off"))
+    db.execute(text("SET LOCAL enable_indexscan = off"))
+    statement = select(App).where(App.app_name.ilike(f"%{escape_like(q)}%", escape="\\"))
+    start_time = time.perf_counter()
+    db.execute(statement.limit(per_page)).scalars().all()
+    db.execute(select(func.count()).select_from(statement.subquery())).scalar()
+    elapsed = (time.perf_counter() - start_time) * 1000
+    db.rollback()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /apps/search latency and recall against a full scan")
+    parser.add_argument("--queries", type=int, default=100, help="number of sampled apps to derive queries from")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=10, help="queries also timed as a sequential ILIKE scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        workload = make_queries(db, args.queries, random.Random(args.seed))
+        timings, hits = {}, {}
+        for kind, q, app_id in workload:
+            elapsed, ids = timed_search(db, q, args.per_page)
+            timings.setdefault(kind, []).append(elapsed)
+            hits.setdefault(kind, []).append(app_id in ids)
+
+        for kind, kind_timings in timings.items():
+            report(kind, kind_timings)
+            print(f"{'':>13}  sampled app on the first page for {sum(hits[kind])}/{len(hits[kind])} queries")
+
+        words = [q for kind, q, _ in workload if kind == "word"][:args.scan_queries]
+        if words:
+            report("trigram", [timed_search(db, q, args.per_page)[0] for q in words])
+            report("seq scan", [timed_scan(db, q, args.per_page) for q in words])
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import statistics
+import time
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal
+from entities import App
+from models import AppModel
+from serialization import OrjsonResponse, parse_fields, app_columns, rows_to_dicts
+
+# what FastAPI does with the dict returned for response_model=dict before rendering it
+RESPONSE_ADAPTER = TypeAdapter(dict)
+
+
+def orm_path(db, per_page: int, fields: list) -> int:
+    apps = db.query(App).limit(per_page).all()
+    content = RESPONSE_ADAPTER.validate_python({"apps": [AppModel.from_orm(app) for app in apps]})
+    body = JSONResponse(RESPONSE_ADAPTER.dump_python(content, mode="json")).body
+    db.expunge_all()
+    return len(body)
+
+
+def row_path(db, per_page: int, fields: list) -> int:
+    rows = db.execute(select(*app_columns(fields)).limit(per_page)).all()
+    return len(OrjsonResponse({"apps": rows_to_dicts(rows, fields)}).body)
+
+
+def rows_per_second(function, db, per_page: int, fields: list, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        size = function(db, per_page, fields)
+        timings.append(time.perf_counter() - start_time)
+    return per_page / statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rows/sec of the ORM + pydantic /apps response with the "
+                                                 "Core row + orjson one")
+    parser.add_argument("--database-url", help="run against this database instead of the one configured in .env")
+    parser.add_argument("--per-page", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--fields", default="id,app_name,rating,installs", help="projection for the last variant")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    session_factory = sessionmaker(bind=create_engine(args.database_url)) if args.database_url else SessionLocal
+    db = session_factory()
+    try:
+        variants = [
+            ("orm + pydantic", orm_path, parse_fields(None)),
+            ("rows + orjson", row_path, parse_fields(None)),
+            (f"rows + orjson, fields={args.fields}", row_path, parse_fields(args.fields)),
+        ]
+        for per_page in args.per_page:
+            print(f"per_page={per_page}")
+            for name, function, fields in variants:
+                rate, size = rows_per_second(function, db, per_page, fields, args.repeat)
+                print(f"  {name:>50}: {rate:10.0f} rows/s, {size / 1024:8.1f} KB")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
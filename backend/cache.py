@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+
+FILTERS_CACHE_TTL = float(os.getenv("FILTERS_CACHE_TTL", "60"))
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", "300"))
+
+
+class VersionedCache:
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._value = None
+        self._value_version = -1
+        self._expires = None
+
+    def get(self, loader):
+        with self._lock:
+            if self._expires is not None and self._expires <= time.monotonic():
+                self._version += 1
+                self._expires = None
+            if self._value_version == self._version:
+                return self._value
+            version = self._version
+
+        value = loader()
+        with self._lock:
+            # a write that raced with the loader leaves the stale value uncached
+            if version == self._version:
+                self._value = value
+                self._value_version = version
+                self._expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._value = None
+
+
+# writes made through another worker or by import_data.py and partitions.py only reach /filters, and its ETag,
+# once the TTL runs out
+filters_cache = VersionedCache(FILTERS_CACHE_TTL)
+# category name -> id, so a category filter does not cost its own round trip before the real query; the TTL bounds
+# how long a category renamed or deleted by another process keeps resolving to its old id
+category_ids_cache = VersionedCache(CATEGORY_CACHE_TTL)
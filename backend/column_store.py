@@ -0,0 +1,196 @@
+import os
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analytics import APP_COLUMNS_SCHEMA, load_from_postgres, snapshot_app
+
+APPS_COLUMN_STORE = os.getenv("APPS_COLUMN_STORE", "false").lower() in ("1", "true", "yes")
+APPS_COLUMN_STORE_COMPACT_ROWS = int(os.getenv("APPS_COLUMN_STORE_COMPACT_ROWS", "1000"))
+
+RANGE_COLUMNS = ("rating", "price", "installs")
+CATEGORICAL_COLUMNS = ("category_id", "content_rating")
+BOOLEAN_COLUMNS = ("free", "ad_supported", "in_app_purchases", "editors_choice")
+
+COMPARISONS = {">=": np.greater_equal, "<=": np.less_equal, "=": np.equal}
+
+
+def group_conditions(conditions: list) -> dict:
+    grouped = {}
+    for column, operator, value in conditions:
+        grouped.setdefault(column, {})[operator] = value
+    return grouped
+
+
+class ColumnIndex:
+    # immutable snapshot of the filterable columns, rows ordered by id; categorical and boolean values
+    # are kept as packed bitmaps, range columns as an argsort order with the sorted values
+    def __init__(self, table: pa.Table):
+        table = table.sort_by("id")
+        self.size = table.num_rows
+        self.ids = table["id"].to_numpy()
+        self.ranges = {}
+        for column in RANGE_COLUMNS:
+            values = table[column].to_numpy(zero_copy_only=False).astype("float64")
+            order = np.argsort(values, kind="stable")
+            self.ranges[column] = (order, values[order])
+        self.bitmaps = {}
+        for column in CATEGORICAL_COLUMNS + BOOLEAN_COLUMNS:
+            values = table[column].to_pandas()
+            self.bitmaps[column] = {
+                value: np.packbits(values.eq(value).fillna(False).to_numpy(dtype=bool))
+                for value in values.dropna().unique()
+            }
+        self.all_rows = np.packbits(np.ones(self.size, dtype=bool))
+
+    def empty(self) -> np.ndarray:
+        return np.zeros_like(self.all_rows)
+
+    def range_bitmap(self, column: str, bounds: dict) -> np.ndarray:
+        order, sorted_values = self.ranges[column]
+        low = np.searchsorted(sorted_values, bounds[">="], "left") if ">=" in bounds else 0
+        # NaN sorts last, so an open upper bound has to stop before the NULL values
+        high = np.searchsorted(sorted_values, bounds.get("<=", np.inf), "right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[low:high]] = True
+        return np.packbits(mask)
+
+    def shadow_bitmap(self, positions: np.ndarray) -> np.ndarray:
+        mask = np.ones(self.size, dtype=bool)
+        mask[positions] = False
+        return np.packbits(mask)
+
+    def match(self, conditions: list) -> np.ndarray:
+        result = self.all_rows.copy()
+        for column, bounds in group_conditions(conditions).items():
+            if column in RANGE_COLUMNS:
+                bitmap = self.range_bitmap(column, bounds)
+            else:
+                bitmap = self.bitmaps[column].get(bounds["="])
+                if bitmap is None:
+                    return self.empty()
+            np.bitwise_and(result, bitmap, out=result)
+        return result
+
+
+def row_matches(row: dict, conditions: list) -> bool:
+    for column, operator, value in conditions:
+        if row[column] is None or not COMPARISONS[operator](row[column], value):
+            return False
+    return True
+
+
+class AppColumnStore:
+    # API writes land in a delta keyed by app id, None marking a deleted app; base rows shadowed by the
+    # delta are masked out and the delta is folded into a rebuilt index once it grows too large
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._table = None
+        self._index = None
+        self._delta = {}
+        self._shadow = None
+
+    def _snapshot(self):
+        with self._lock:
+            if self._index is None:
+                self._table = self._loader()
+                self._index = ColumnIndex(self._table)
+                self._delta = {}
+                self._shadow = None
+            if self._shadow is None:
+                delta_ids = np.fromiter(self._delta, dtype="int64")
+                positions = np.searchsorted(self._index.ids, delta_ids)
+                found = positions < self._index.size
+                found[found] = self._index.ids[positions[found]] == delta_ids[found]
+                self._shadow = self._index.shadow_bitmap(positions[found])
+            return self._index, self._shadow, dict(self._delta)
+
+    def matching_ids(self, conditions: list) -> np.ndarray:
+        index, shadow, delta = self._snapshot()
+        bitmap = index.match(conditions)
+        np.bitwise_and(bitmap, shadow, out=bitmap)
+        ids = index.ids[np.flatnonzero(np.unpackbits(bitmap, count=index.size))]
+        extra = np.array(sorted(app_id for app_id, row in delta.items()
+                                if row is not None and row_matches(row, conditions)), dtype="int64")
+        if len(extra):
+            ids = np.insert(ids, np.searchsorted(ids, extra), extra)
+        return ids
+
+    def count(self, conditions: list) -> int:
+        index, shadow, delta = self._snapshot()
+        bitmap = index.match(conditions)
+        np.bitwise_and(bitmap, shadow, out=bitmap)
+        extra = sum(1 for row in delta.values() if row is not None and row_matches(row, conditions))
+        return int(np.bitwise_count(bitmap).sum()) + extra
+
+    def page(self, conditions: list, offset: int, limit: int):
+        ids = self.matching_ids(conditions)
+        return ids[offset:offset + limit].tolist(), len(ids)
+
+    def page_after(self, conditions: list, after_id: int, limit: int) -> list:
+        ids = self.matching_ids(conditions)
+        start = np.searchsorted(ids, after_id, "right")
+        return ids[start:start + limit].tolist()
+
+    def _write(self, app_id: int, row):
+        with self._lock:
+            if self._index is None:
+                return
+            self._delta[app_id] = row
+            self._shadow = None
+            if len(self._delta) >= APPS_COLUMN_STORE_COMPACT_ROWS:
+                self._compact()
+
+    def _compact(self):
+        replaced = pa.array(list(self._delta), pa.int64())
+        kept = self._table.filter(pc.invert(pc.is_in(self._table["id"], value_set=replaced)))
+        rows = [row for row in self._delta.values() if row is not None]
+        self._table = pa.concat_tables([kept, pa.Table.from_pylist(rows, schema=APP_COLUMNS_SCHEMA)])
+        self._index = ColumnIndex(self._table)
+        self._delta = {}
+        self._shadow = None
+
+    def upsert(self, row: dict):
+        self._write(row["id"], row)
+
+    def delete(self, app_id: int):
+        self._write(app_id, None)
+
+    def clear_category(self, category_id: int):
+        with self._lock:
+            if self._index is None:
+                return
+            self._compact()
+            column = self._table["category_id"]
+            cleared = pc.if_else(pc.equal(column, category_id), pa.scalar(None, pa.int32()), column)
+            self._table = self._table.set_column(self._table.schema.get_field_index("category_id"),
+                                                 "category_id", cleared)
+            self._index = ColumnIndex(self._table)
+
+    def reload(self):
+        with self._lock:
+            self._table = None
+            self._index = None
+            self._delta = {}
+            self._shadow = None
+
+
+app_store = AppColumnStore(load_from_postgres)
+
+
+def app_saved(db_app):
+    if APPS_COLUMN_STORE:
+        app_store.upsert(snapshot_app(db_app))
+
+
+def app_deleted(app_id: int):
+    if APPS_COLUMN_STORE:
+        app_store.delete(app_id)
+
+
+def category_deleted(category_id: int):
+    if APPS_COLUMN_STORE:
+        app_store.clear_category(category_id)
@@ -0,0 +1,37 @@
+import os
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+APPS_PARQUET_PATH = os.getenv(
+    "APPS_PARQUET_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "cleaned_apps_parquet")
+)
+
+# written by pipeline/parquet_output.py: one directory per category_id, null categories in the hive default partition
+APPS_PARTITIONING = ds.partitioning(pa.schema([("category_id", pa.int32())]), flavor="hive")
+
+
+@lru_cache(maxsize=4)
+def open_apps_dataset(path: str = APPS_PARQUET_PATH) -> ds.Dataset:
+    # memory-mapped reads let Arrow hand out column buffers straight from the page cache
+    return ds.dataset(
+        path,
+        format="parquet",
+        partitioning=APPS_PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_apps(columns: list, filter=None, path: str = APPS_PARQUET_PATH) -> pa.Table:
+    return open_apps_dataset(path).to_table(columns=columns, filter=filter)
+
+
+def iter_app_batches(columns: list, filter=None, batch_size: int = 128 * 1024, path: str = APPS_PARQUET_PATH):
+    yield from open_apps_dataset(path).to_batches(columns=columns, filter=filter, batch_size=batch_size)
+
+
+def reload_apps_dataset():
+    open_apps_dataset.cache_clear()
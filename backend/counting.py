@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy import text, select, func
+
+COUNT_MODES = ("exact", "estimate", "cached")
+COUNT_MODE = os.getenv("COUNT_MODE", "exact")
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "10000"))
+
+# least recently used first
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+def normalize_filters(filters: dict) -> tuple:
+    # apply_filters_to_query ignores falsy values, so they must not split the cache either
+    return tuple(sorted((key, value) for key, value in filters.items() if value))
+
+
+def exact_count(db, statement) -> int:
+    return db.execute(select(func.count()).select_from(statement.order_by(None).subquery())).scalar()
+
+
+def estimate_count(db, statement, table_name: str, filters: dict) -> int:
+    if not normalize_filters(filters):
+        # a partitioned table keeps its row estimates on the leaf partitions; a plain table is its own leaf
+        reltuples = db.execute(
+            text("""
+                SELECT CASE WHEN bool_and(c.reltuples >= 0) THEN SUM(c.reltuples)::bigint END
+                FROM pg_partition_tree(CAST(:table_name AS regclass)) t JOIN pg_class c ON c.oid = t.relid
+                WHERE t.isleaf
+            """),
+            {"table_name": table_name}
+        ).scalar()
+        if reltuples is not None and reltuples >= 0:
+            return reltuples
+
+    compiled = statement.order_by(None).compile(dialect=db.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_count(db, statement, table_name: str, filters: dict) -> int:
+    key = (table_name, normalize_filters(filters))
+    now = time.monotonic()
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[1] > now:
+            _count_cache.move_to_end(key)
+            return entry[0]
+
+    total = exact_count(db, statement)
+    with _count_cache_lock:
+        _count_cache[key] = (total, now + COUNT_CACHE_TTL)
+        _count_cache.move_to_end(key)
+        # expired entries go first, then the least recently used ones beyond the cap
+        for expired in [cached_key for cached_key, (_, expires) in _count_cache.items() if expires <= now]:
+            del _count_cache[expired]
+        while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+    return total
+
+
+def count_rows(db, statement, table_name: str, filters: dict, mode: str = None):
+    mode = mode or COUNT_MODE
+    if mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown count mode '{mode}', expected one of {list(COUNT_MODES)}")
+
+    if mode == "estimate":
+        return estimate_count(db, statement, table_name, filters), True
+    if mode == "cached":
+        return cached_count(db, statement, table_name, filters), False
+    return exact_count(db, statement), False
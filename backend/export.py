@@ -0,0 +1,83 @@
+import csv
+import io
+import os
+
+import orjson
+import pyarrow as pa
+from sqlalchemy import Boolean, Date, Float, Integer, TIMESTAMP
+
+from database import engine
+from entities import App
+from serialization import encode_value
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+ARROW_TYPES = [
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Float, pa.float64()),
+    (TIMESTAMP, pa.timestamp("us")),
+    (Date, pa.date32()),
+]
+
+
+def arrow_schema(fields: list) -> pa.Schema:
+    def arrow_type(column_type):
+        return next((arrow for sql, arrow in ARROW_TYPES if isinstance(column_type, sql)), pa.string())
+
+    return pa.schema([(name, arrow_type(getattr(App, name).type)) for name in fields])
+
+
+def iter_batches(statement, batch_size: int):
+    # a server-side cursor (a named cursor on psycopg2) keeps one batch in memory at a time; the export uses its
+    # own connection because it outlives the request's session
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+        yield from result.partitions()
+
+
+def encode_ndjson(batches, fields: list):
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+    for rows in batches:
+        yield b"".join(orjson.dumps(dict(zip(fields, row)), default=encode_value, option=option) for row in rows)
+
+
+def encode_csv(batches, fields: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in batches:
+        writer.writerows([encode_value(value) if hasattr(value, "strftime") else value for value in row]
+                         for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_arrow(batches, fields: list):
+    schema = arrow_schema(fields)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch(
+                [pa.array(column, field.type) for column, field in zip(columns, schema)], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv, "arrow": encode_arrow}
+
+
+def export_apps(statement, fields: list, export_format: str, batch_size: int = EXPORT_BATCH_ROWS):
+    return ENCODERS[export_format](iter_batches(statement, batch_size), fields)
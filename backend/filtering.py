@@ -0,0 +1,66 @@
+import hashlib
+
+from sqlalchemy import func, distinct
+
+from entities import App, Category
+from models import FilterModel
+
+
+def apply_filters(query, filters: dict, category_id: int = None):
+    if category_id:
+        query = query.filter(App.category_id == category_id)
+    if filters.get("min_rating"):
+        query = query.filter(App.rating >= filters["min_rating"])
+    if filters.get("max_rating"):
+        query = query.filter(App.rating <= filters["max_rating"])
+    if filters.get("min_price"):
+        query = query.filter(App.price >= filters["min_price"])
+    if filters.get("max_price"):
+        query = query.filter(App.price <= filters["max_price"])
+    if filters.get("min_installs"):
+        query = query.filter(App.installs >= filters["min_installs"])
+    if filters.get("max_installs"):
+        query = query.filter(App.installs <= filters["max_installs"])
+    if filters.get("content_rating"):
+        query = query.filter(App.content_rating == filters["content_rating"])
+    if filters.get("free"):
+        query = query.filter(App.free == filters["free"])
+    if filters.get("ad_supported"):
+        query = query.filter(App.ad_supported == filters["ad_supported"])
+    if filters.get("in_app_purchases"):
+        query = query.filter(App.in_app_purchases == filters["in_app_purchases"])
+    if filters.get("editors_choice"):
+        query = query.filter(App.editors_choice == filters["editors_choice"])
+
+    return query
+
+
+def load_category_ids(db) -> dict:
+    return {name: category_id for category_id, name in db.query(Category.id, Category.name)}
+
+
+def load_filters(db):
+    categories = db.query(Category.name).all()
+    categories = [category[0] for category in categories]
+    stats = db.query(
+        func.array_agg(distinct(App.content_rating)),
+        func.min(App.rating),
+        func.max(App.rating),
+        func.min(App.price),
+        func.max(App.price),
+        func.min(App.installs),
+        func.max(App.installs),
+    ).one()
+    content_ratings, min_rating, max_rating, min_price, max_price, min_installs, max_installs = stats
+    filter_model = FilterModel(
+        categories=categories,
+        content_ratings=[content_rating for content_rating in content_ratings or [] if content_rating is not None],
+        min_rating=min_rating or 0,
+        max_rating=max_rating or 5.0,
+        min_price=min_price or 0.0,
+        max_price=max_price or 100.0,
+        min_installs=min_installs or 0,
+        max_installs=max_installs or 10000000
+    )
+    etag = '"' + hashlib.sha1(filter_model.model_dump_json().encode()).hexdigest() + '"'
+    return filter_model, etag
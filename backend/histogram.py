@@ -0,0 +1,82 @@
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Float, Integer, Numeric, case, cast, func, literal, select
+
+from entities import App
+from filtering import apply_filters
+
+HISTOGRAM_BUCKETS = int(os.getenv("HISTOGRAM_BUCKETS", "20"))
+HISTOGRAM_MAX_BUCKETS = int(os.getenv("HISTOGRAM_MAX_BUCKETS", "1000"))
+
+HISTOGRAM_COLUMNS = {
+    "rating": App.rating,
+    "price": App.price,
+    "installs": App.installs,
+    "size": App.size,
+    "rating_count": App.rating_count,
+}
+# spread over several orders of magnitude, so binned on log10(value + 1) unless asked otherwise
+LOG_SCALE_COLUMNS = {"installs", "rating_count"}
+
+# the same buckets as app_rating_stats, one per rating rounded to one decimal
+RATING_BUCKET = func.round(cast(App.rating, Numeric), 1)
+
+
+def scaled(column: str, log: bool):
+    value = cast(HISTOGRAM_COLUMNS[column], Float)
+    return func.log(value + 1) if log else value
+
+
+def unscaled(edge: float, log: bool) -> float:
+    return 10 ** edge - 1 if log else edge
+
+
+def check_bins(buckets: Optional[int], width: Optional[float]) -> Optional[int]:
+    if buckets is not None and width is not None:
+        raise HTTPException(status_code=400, detail="Give either buckets or width, not both")
+    return HISTOGRAM_BUCKETS if buckets is None and width is None else buckets
+
+
+def histogram_statement(column: str, filters: dict, category_id: Optional[int], buckets: Optional[int],
+                        width: Optional[float], log: bool):
+    # the filtered values are read once; their bounds and the width_bucket of every value come from that one pass
+    value = scaled(column, log)
+    filtered = apply_filters(select(value.label("value")).where(HISTOGRAM_COLUMNS[column].is_not(None)),
+                             filters, category_id).cte("filtered")
+    bounds = select(func.min(filtered.c.value).label("low"), func.max(filtered.c.value).label("high")).subquery()
+
+    if width is None:
+        low = bounds.c.low
+        count = literal(buckets)
+        # width_bucket refuses equal bounds, which a single distinct value gives
+        high = case((bounds.c.high > bounds.c.low, bounds.c.high), else_=bounds.c.low + 1)
+    else:
+        # buckets aligned on multiples of the width, as many as the range needs up to the cap
+        low = func.floor(bounds.c.low / width) * width
+        count = cast(func.least(func.floor((bounds.c.high - low) / width) + 1, HISTOGRAM_MAX_BUCKETS), Integer)
+        high = low + count * width
+    bins = select(low.label("low"), high.label("high"), count.label("buckets")).subquery("bins")
+
+    # the maximum lands in bucket count + 1, as does everything above a capped range; both go into the last bucket
+    bucket = func.least(func.width_bucket(filtered.c.value, bins.c.low, bins.c.high, bins.c.buckets), bins.c.buckets)
+    return select(bucket.label("bucket"), func.count().label("count"), bins.c.low, bins.c.high, bins.c.buckets) \
+        .select_from(filtered).join(bins, literal(True)) \
+        .group_by(bucket, bins.c.low, bins.c.high, bins.c.buckets)
+
+
+def histogram(rows, column: str, log: bool) -> dict:
+    # every bucket of the range, empty ones included, so the payload is sized by the bucket count alone
+    rows = list(rows)
+    if not rows:
+        return {"column": column, "log": log, "buckets": []}
+    low, high, buckets = rows[0].low, rows[0].high, rows[0].buckets
+    width = (high - low) / buckets
+    counts = {row.bucket: row.count for row in rows}
+    return {
+        "column": column,
+        "log": log,
+        "buckets": [{"low": unscaled(low + index * width, log), "high": unscaled(low + (index + 1) * width, log),
+                     "count": counts.get(index + 1, 0)} for index in range(buckets)],
+    }
@@ -0,0 +1,178 @@
+import argparse
+import io
+import os
+import re
+import time
+
+from database import engine, SessionLocal
+from rollups import STATISTICS_ROLLUP, refresh_rollups
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sql")
+
+# load order follows the foreign keys of sql/schema.sql
+IMPORT_FILES = [
+    ("categories", "cleaned_categories.csv"),
+    ("developers", "cleaned_developers.csv"),
+    ("apps", "cleaned_apps.csv"),
+]
+
+CREATE_PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS import_progress (
+        file_name VARCHAR(255) PRIMARY KEY,
+        byte_offset BIGINT NOT NULL,
+        rows_loaded BIGINT NOT NULL,
+        finished BOOLEAN NOT NULL DEFAULT FALSE
+    )
+"""
+
+
+def apps_is_partitioned(cursor) -> bool:
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'apps'::regclass")
+    return cursor.fetchone()[0]
+
+
+def read_index_statements(partitioned: bool = False) -> list:
+    with open(os.path.join(SQL_DIR, "indexes_partitioned.sql" if partitioned else "indexes.sql")) as f:
+        return [statement.strip() for statement in f.read().split(";") if statement.strip()]
+
+
+def index_name(statement: str) -> str:
+    return re.search(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", statement, re.I).group(1)
+
+
+def iter_csv_records(f):
+    # a record ends on a newline outside quotes; doubled "" escapes keep the quote count balanced
+    record = []
+    quotes = 0
+    for line in f:
+        record.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield b"".join(record)
+            record = []
+            quotes = 0
+    if record:
+        yield b"".join(record)
+
+
+def copy_chunk(cursor, copy_sql: str, data: bytes):
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(copy_sql, io.BytesIO(data))
+    else:
+        with cursor.copy(copy_sql) as copy:
+            copy.write(data)
+
+
+def load_progress(cursor, file_name: str):
+    cursor.execute("SELECT byte_offset, rows_loaded, finished FROM import_progress WHERE file_name = %s", (file_name,))
+    return cursor.fetchone() or (0, 0, False)
+
+
+def save_progress(cursor, file_name: str, byte_offset: int, rows_loaded: int, finished: bool = False):
+    cursor.execute(
+        "INSERT INTO import_progress (file_name, byte_offset, rows_loaded, finished) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (file_name) DO UPDATE SET byte_offset = EXCLUDED.byte_offset, "
+        "rows_loaded = EXCLUDED.rows_loaded, finished = EXCLUDED.finished",
+        (file_name, byte_offset, rows_loaded, finished)
+    )
+
+
+def import_file(connection, table: str, path: str, chunk_rows: int):
+    file_name = os.path.basename(path)
+    cursor = connection.cursor()
+    byte_offset, rows_loaded, finished = load_progress(cursor, file_name)
+    if finished:
+        print(f"{file_name}: already loaded ({rows_loaded} rows), skipping")
+        return
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        columns = ", ".join(column.strip() for column in header.decode().strip().split(","))
+        copy_sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        if byte_offset:
+            print(f"{file_name}: resuming after {rows_loaded} rows")
+            f.seek(byte_offset)
+        else:
+            byte_offset = f.tell()
+
+        start_time = time.time()
+        loaded_now = 0
+        chunk = []
+        chunk_bytes = 0
+        for record in iter_csv_records(f):
+            chunk.append(record)
+            chunk_bytes += len(record)
+            if len(chunk) >= chunk_rows:
+                copy_chunk(cursor, copy_sql, b"".join(chunk))
+                byte_offset += chunk_bytes
+                rows_loaded += len(chunk)
+                loaded_now += len(chunk)
+                save_progress(cursor, file_name, byte_offset, rows_loaded)
+                connection.commit()
+                elapsed = time.time() - start_time
+                print(f"{file_name}: {rows_loaded} rows ({loaded_now / elapsed:.0f} rows/sec)")
+                chunk = []
+                chunk_bytes = 0
+
+        if chunk:
+            copy_chunk(cursor, copy_sql, b"".join(chunk))
+            byte_offset += chunk_bytes
+            rows_loaded += len(chunk)
+            loaded_now += len(chunk)
+        save_progress(cursor, file_name, byte_offset, rows_loaded, finished=True)
+        connection.commit()
+
+    elapsed = time.time() - start_time
+    print(f"{file_name}: loaded {loaded_now} rows in {elapsed:.1f} seconds "
+          f"({loaded_now / elapsed if elapsed else 0:.0f} rows/sec)")
+
+
+def import_data(data_dir: str, chunk_rows: int, restart: bool):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        index_statements = read_index_statements(apps_is_partitioned(cursor))
+        cursor.execute(CREATE_PROGRESS_TABLE)
+        if restart:
+            cursor.execute("DELETE FROM import_progress")
+            cursor.execute(f"TRUNCATE {', '.join(table for table, _ in IMPORT_FILES)}")
+        for statement in index_statements:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name(statement)}")
+        connection.commit()
+
+        for table, file_name in IMPORT_FILES:
+            import_file(connection, table, os.path.join(data_dir, file_name), chunk_rows)
+
+        start_time = time.time()
+        for statement in index_statements:
+            cursor.execute(statement)
+        for table, _ in IMPORT_FILES:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                           f"COALESCE((SELECT MAX(id) FROM {table}), 1))")
+        for table, _ in IMPORT_FILES:
+            cursor.execute(f"ANALYZE {table}")
+        connection.commit()
+        print(f"Recreated {len(index_statements)} indexes in {time.time() - start_time:.1f} seconds")
+    finally:
+        connection.close()
+
+    if STATISTICS_ROLLUP:
+        db = SessionLocal()
+        try:
+            refresh_rollups(db)
+        finally:
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load the cleaned CSV files into PostgreSQL with COPY")
+    parser.add_argument("--data-dir", default=os.path.join("..", "data"))
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--restart", action="store_true",
+                        help="truncate the tables and load from scratch instead of resuming")
+    args = parser.parse_args()
+    import_data(args.data_dir, args.chunk_rows, args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import random
+import statistics
+
+from sqlalchemy import create_engine, select, func, text
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal
+from entities import App, Category
+from filtering import apply_filters, load_filters
+from analytics import filter_conditions
+from histogram import RATING_BUCKET
+from benchmark_filters import random_filters
+
+RANGE_COLUMNS = ("rating", "installs", "price")
+BOOLEAN_COLUMNS = ("free", "ad_supported", "in_app_purchases", "editors_choice")
+# a boolean that is true for at most this share of the rows makes a useful partial index predicate
+PARTIAL_INDEX_MAX_FRACTION = 0.2
+
+
+def explain_analyze(connection, statement) -> dict:
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_summary(plan: dict) -> dict:
+    summary = {"ms": plan["Execution Time"], "shared_hit": 0, "shared_read": 0, "indexes": set(), "nodes": set()}
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        summary["nodes"].add(node["Node Type"])
+        if "Index Name" in node:
+            summary["indexes"].add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+    # buffer counters of the top node already include its children
+    summary["shared_hit"] = plan["Plan"].get("Shared Hit Blocks", 0)
+    summary["shared_read"] = plan["Plan"].get("Shared Read Blocks", 0)
+    return summary
+
+
+def build_workload(db, queries: int, seed: int) -> list:
+    # the statements main.py issues for the dashboard: an /apps page with its count, and the statistics endpoints
+    rng = random.Random(seed)
+    filter_model, _ = load_filters(db)
+    category_ids = {name: category_id for category_id, name in db.query(Category.id, Category.name)}
+    workload = []
+    for number in range(queries):
+        filters = random_filters(filter_model, rng)
+        category_id = category_ids.get(filters["category"])
+        conditions = filter_conditions(filters, category_id)
+        page = apply_filters(select(App), filters, category_id).limit(100)
+        count = select(func.count()).select_from(apply_filters(select(App.id), filters, category_id).subquery())
+        distribution = apply_filters(select(RATING_BUCKET, func.count()), filters, category_id) \
+            .group_by(RATING_BUCKET).order_by(RATING_BUCKET)
+        workload.append({"name": f"apps_page_{number}", "shape": "apps_page", "conditions": conditions,
+                         "statement": page})
+        workload.append({"name": f"apps_count_{number}", "shape": "apps_count", "conditions": conditions,
+                         "statement": count})
+        workload.append({"name": f"rating_distribution_{number}", "shape": "rating_distribution",
+                         "conditions": conditions, "statement": distribution})
+
+    for category_id in list(category_ids.values())[:5]:
+        conditions = [("category_id", "=", category_id)]
+        for shape, column in (("release_trend", App.released), ("update_trend", App.last_updated)):
+            year = func.extract("year", column)
+            statement = select(year.label("year"), func.count()).filter(App.category_id == category_id) \
+                .group_by(year).order_by("year")
+            workload.append({"name": f"{shape}_{category_id}", "shape": shape, "conditions": conditions,
+                             "group_by": column.key, "statement": statement})
+        workload.append({"name": f"average_rating_{category_id}", "shape": "average_rating",
+                         "conditions": conditions, "group_by": "rating",
+                         "statement": select(func.avg(App.rating)).filter(App.category_id == category_id)})
+    return workload
+
+
+def true_fractions(db) -> dict:
+    # pg_stats keeps the frequency of each boolean value in most_common_vals/most_common_freqs
+    rows = db.execute(text("""
+        SELECT attname, most_common_vals::text, most_common_freqs
+        FROM pg_stats WHERE tablename = 'apps' AND attname = ANY(:columns)
+    """), {"columns": list(BOOLEAN_COLUMNS)})
+    fractions = {}
+    for column, values, frequencies in rows:
+        values = (values or "{}").strip("{}").split(",")
+        fractions[column] = dict(zip(values, frequencies or [])).get("t", 0.0)
+    return fractions
+
+
+def index_shape(query: dict, fractions: dict):
+    equality, ranges, partial, include = [], [], [], []
+    for column, operator, _ in query["conditions"]:
+        if column in BOOLEAN_COLUMNS:
+            (partial if fractions.get(column, 1.0) <= PARTIAL_INDEX_MAX_FRACTION else include).append(column)
+        elif operator == "=":
+            equality.append(column)
+        elif column not in ranges:
+            ranges.append(column)
+    ranges.sort(key=RANGE_COLUMNS.index)
+
+    # equality columns lead, then one range or grouping column; the rest is carried along so
+    # count and aggregate queries can be answered by an index-only scan
+    keys = equality + ranges[:1]
+    include.extend(ranges[1:])
+    if query.get("group_by") and query["group_by"] not in keys:
+        keys.append(query["group_by"])
+    if query["shape"] == "rating_distribution" and "rating" not in keys:
+        keys.append("rating")
+    if not keys and not partial:
+        return None
+    include = [column for column in dict.fromkeys(include) if column not in keys]
+    return tuple(keys or ["id"]), tuple(sorted(include)), tuple(sorted(partial))
+
+
+def index_ddl(shape: tuple) -> tuple:
+    keys, include, partial = shape
+    name = "idx_apps_advisor_" + hashlib.sha1(repr(shape).encode()).hexdigest()[:10]
+    ddl = f"CREATE INDEX {name} ON apps ({', '.join(keys)})"
+    if include:
+        ddl += f" INCLUDE ({', '.join(include)})"
+    if partial:
+        ddl += " WHERE " + " AND ".join(partial)
+    return name, ddl
+
+
+def propose_indexes(workload: list, fractions: dict, limit: int) -> list:
+    proposals = {}
+    for query in workload:
+        shape = index_shape(query, fractions)
+        if shape is None:
+            continue
+        name, ddl = index_ddl(shape)
+        proposals.setdefault(name, {"name": name, "ddl": ddl, "queries": []})["queries"].append(query)
+    return sorted(proposals.values(), key=lambda proposal: len(proposal["queries"]), reverse=True)[:limit]
+
+
+def measure(connection, queries: list, repeat: int) -> dict:
+    results = {}
+    for query in queries:
+        summaries = [plan_summary(explain_analyze(connection, query["statement"])) for _ in range(repeat)]
+        median = sorted(summaries, key=lambda summary: summary["ms"])[len(summaries) // 2]
+        results[query["name"]] = median
+    return results
+
+
+def existing_indexes(connection) -> dict:
+    rows = connection.execute(text("""
+        SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes WHERE relname = 'apps'
+    """))
+    return {name: size for name, size in rows}
+
+
+def report_baseline(workload: list, baseline: dict, indexes: dict):
+    print("Baseline by query shape:")
+    shapes = {}
+    for query in workload:
+        shapes.setdefault(query["shape"], []).append(baseline[query["name"]])
+    for shape, summaries in shapes.items():
+        used = set().union(*(summary["indexes"] for summary in summaries))
+        print(f"  {shape:>20}: mean {statistics.mean(s['ms'] for s in summaries):9.2f} ms, "
+              f"mean buffers {statistics.mean(s['shared_hit'] + s['shared_read'] for s in summaries):10.0f}, "
+              f"indexes {', '.join(sorted(used)) or '-'}")
+    used = set().union(*(summary["indexes"] for summary in baseline.values()))
+    for name, size in sorted(indexes.items()):
+        if name not in used:
+            print(f"  unused by the workload: {name} ({size / 1024 / 1024:.1f} MB)")
+
+
+def evaluate(connection, proposal: dict, baseline: dict, repeat: int, keep: bool) -> dict:
+    connection.exec_driver_sql(proposal["ddl"])
+    connection.exec_driver_sql("ANALYZE apps")
+    after = measure(connection, proposal["queries"], repeat)
+    size = connection.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"),
+                              {"name": proposal["name"]}).scalar()
+    if not keep:
+        connection.exec_driver_sql(f"DROP INDEX {proposal['name']}")
+    names = [query["name"] for query in proposal["queries"]]
+    return {
+        "ddl": proposal["ddl"],
+        "queries": len(names),
+        "size_mb": size / 1024 / 1024,
+        "before_ms": statistics.mean(baseline[name]["ms"] for name in names),
+        "after_ms": statistics.mean(after[name]["ms"] for name in names),
+        "used_by": sum(1 for name in names if proposal["name"] in after[name]["indexes"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the dashboard query shapes with EXPLAIN ANALYZE and "
+                                                 "measure candidate composite, partial and covering indexes")
+    parser.add_argument("--database-url", help="run against this database instead of the one configured in .env")
+    parser.add_argument("--queries", type=int, default=50, help="number of random filter combinations")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="EXPLAIN ANALYZE runs per query, the median is kept")
+    parser.add_argument("--max-proposals", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the proposed indexes instead of dropping them")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    session_factory = sessionmaker(bind=create_engine(args.database_url)) if args.database_url else SessionLocal
+    db = session_factory()
+    try:
+        workload = build_workload(db, args.queries, args.seed)
+        fractions = true_fractions(db)
+        db.commit()
+        # index DDL and EXPLAIN ANALYZE run outside a transaction so every proposal is visible to the planner
+        connection = db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT")
+
+        indexes = existing_indexes(connection)
+        baseline = measure(connection, workload, args.repeat)
+        report_baseline(workload, baseline, indexes)
+
+        results = []
+        print("Proposals:")
+        for proposal in propose_indexes(workload, fractions, args.max_proposals):
+            result = evaluate(connection, proposal, baseline, args.repeat, args.keep)
+            results.append(result)
+            print(f"  {result['ddl']}")
+            print(f"    {result['queries']} queries, used by {result['used_by']}, {result['size_mb']:.1f} MB, "
+                  f"{result['before_ms']:.2f} ms -> {result['after_ms']:.2f} ms")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({
+                    "baseline": {name: {**summary, "indexes": sorted(summary["indexes"]),
+                                        "nodes": sorted(summary["nodes"])} for name, summary in baseline.items()},
+                    "existing_indexes": indexes,
+                    "proposals": results,
+                }, f, indent=2)
+        connection.close()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
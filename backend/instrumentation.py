@@ -0,0 +1,117 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy import event
+
+SQL_SAMPLE_RATE = float(os.getenv("SQL_SAMPLE_RATE", "0.1"))
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "500"))
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def render_statement(statement: str, parameters, executemany: bool) -> str:
+    if executemany and parameters:
+        return f"{statement} -- {len(parameters)} parameter sets, first: {parameters[0]!r}"
+    return f"{statement} -- parameters: {parameters!r}"
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float):
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self) -> dict:
+        buckets = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, statement_fingerprint: str, elapsed_ms: float):
+        with self._lock:
+            histogram = self._histograms.get(statement_fingerprint)
+            if histogram is None:
+                histogram = self._histograms[statement_fingerprint] = LatencyHistogram()
+            histogram.record(elapsed_ms)
+
+    def top(self, limit: int = 10, order_by: str = "total_ms") -> list:
+        with self._lock:
+            stats = [{"fingerprint": key, **histogram.to_dict()} for key, histogram in self._histograms.items()]
+        stats.sort(key=lambda entry: entry[order_by], reverse=True)
+        return stats[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+query_stats = QueryStats()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    # every statement goes into the histograms, so their percentiles are not skewed toward the slow ones;
+    # only the logging is sampled
+    query_stats.record(fingerprint(statement), elapsed_ms)
+    if elapsed_ms >= SQL_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed_ms, render_statement(statement, parameters, executemany))
+    elif logger.isEnabledFor(logging.DEBUG) and random.random() < SQL_SAMPLE_RATE:
+        logger.debug("Query (%.1f ms): %s", elapsed_ms, render_statement(statement, parameters, executemany))
+
+
+def handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start_time"):
+        context.connection.info["query_start_time"].pop()
+
+
+def install_instrumentation(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
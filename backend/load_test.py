@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, url: str, deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get(url)
+            if response.status_code == 200:
+                stats["ok"] += 1
+            else:
+                stats["errors"] += 1
+        except httpx.HTTPError:
+            stats["errors"] += 1
+
+
+async def run(url: str, concurrency: int, duration: float) -> dict:
+    stats = {"ok": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        start_time = time.perf_counter()
+        deadline = start_time + duration
+        await asyncio.gather(*(worker(client, url, deadline, stats) for _ in range(concurrency)))
+        stats["elapsed"] = time.perf_counter() - start_time
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests/sec of a backend endpoint at fixed concurrency")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/apps?per_page=100")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args.url, args.concurrency, args.duration))
+    print(f"{args.url} @ {args.concurrency} concurrent clients: "
+          f"{stats['ok'] / stats['elapsed']:.1f} requests/sec ({stats['ok']} ok, {stats['errors']} errors)")
+
+
+if __name__ == "__main__":
+    main()
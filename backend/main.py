@@ -1,39 +1,87 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import Query, Depends, FastAPI
-from sqlalchemy import func
+from fastapi import Query, Depends, FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, select
 
 from models import FilterModel, AppModel, CategoryModel, DeveloperModel, UpsertCategoryModel, UpsertDeveloperModel, \
-    UpsertAppModel
-from database import SessionLocal, get_db
+    UpsertAppModel, BatchUpsertAppModel, BatchUpdateAppModel, BatchUpdateCategoryModel, BatchUpdateDeveloperModel, \
+    BatchDeleteModel, BatchItemResultModel, StatisticRequestModel
+from database import SessionLocal, get_db, DB_ASYNC, engine, async_engine
 from entities import Category, App, Developer
-
-app = FastAPI()
+from filtering import apply_filters, load_filters, load_category_ids
+from pagination import APP_SORT_COLUMNS, DEVELOPER_SORT_COLUMNS, resolve_sort_column, fetch_keyset_page, \
+    keyset_segments, fetch_keyset_rows, decode_cursor, split_keyset_page
+from counting import count_rows
+from cache import filters_cache, category_ids_cache
+from serialization import OrjsonResponse, parse_fields, app_columns, rows_to_dicts
+import rollups
+import analytics
+import column_store
+import search
+import suggest
+import export
+import batch
+import statistics_batch
+import histogram
+from histogram import RATING_BUCKET
+from pool_metrics import pool_status
+from instrumentation import query_stats
+from response_cache import RESPONSE_CACHE, ResponseCacheMiddleware, response_cache
+
+
+@asynccontextmanager
+async def lifespan(_):
+    # the typeahead index is built in the background so startup does not wait for it
+    suggest.warm_up()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+if RESPONSE_CACHE:
+    app.add_middleware(ResponseCacheMiddleware)
 
 
 @app.get("/filters", response_model=FilterModel)
-def get_filters(db: SessionLocal = Depends(get_db)):
-    categories = db.query(Category.name).all()
-    categories = [category[0] for category in categories]
-    content_ratings = db.query(App.content_rating).distinct().all()
-    content_ratings = [content_rating[0] for content_rating in content_ratings]
-    min_rating = db.query(func.min(App.rating)).scalar() or 0
-    max_rating = db.query(func.max(App.rating)).scalar() or 5.0
-    min_price = db.query(func.min(App.price)).scalar() or 0.0
-    max_price = db.query(func.max(App.price)).scalar() or 100.0
-    min_installs = db.query(func.min(App.installs)).scalar() or 0
-    max_installs = db.query(func.max(App.installs)).scalar() or 10000000
-    return FilterModel(
-        categories=categories,
-        content_ratings=content_ratings,
-        min_rating=min_rating,
-        max_rating=max_rating,
-        min_price=min_price,
-        max_price=max_price,
-        min_installs=min_installs,
-        max_installs=max_installs
-    )
+def get_filters(request: Request, db: SessionLocal = Depends(get_db)):
+    filter_model, etag = filters_cache.get(lambda: load_filters(db))
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=filter_model.model_dump(), headers={"ETag": etag})
+
+
+@app.get("/metrics", response_model=dict)
+def get_metrics():
+    metrics = {"pool": pool_status(engine), "response_cache": response_cache.stats()}
+    if async_engine is not None:
+        metrics["async_pool"] = pool_status(async_engine.sync_engine)
+    return metrics
+
+
+@app.get("/admin/queries", response_model=List[dict])
+def get_slowest_queries(
+        top: Optional[int] = Query(10, ge=1),
+        order_by: Optional[str] = Query("total_ms", pattern="^(total_ms|mean_ms|max_ms|count)$")
+):
+    return query_stats.top(top, order_by)
+
+
+@app.delete("/admin/queries", response_model=dict)
+def reset_query_stats():
+    query_stats.reset()
+    return {"reset": True}
+
+
+@app.post("/admin/analytics/reload", response_model=dict)
+def reload_analytics():
+    analytics.app_store.reload()
+    column_store.app_store.reload()
+    suggest.reload()
+    invalidate_category_caches()
+    rollups.rollup_cache.invalidate()
+    return {"reloaded": True}
 
 
 @app.get("/apps", response_model=dict)
@@ -52,6 +100,10 @@ def get_filtered_apps(
         editors_choice: Optional[bool] = Query(None),
         page: Optional[int] = Query(1, ge=1),
         per_page: Optional[int] = Query(100, ge=1),
+        after: Optional[str] = Query(None),
+        sort_by: Optional[str] = Query("id"),
+        count_mode: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None),
         db: SessionLocal = Depends(get_db)
 ):
     filters = {
@@ -69,12 +121,106 @@ def get_filtered_apps(
         "editors_choice": editors_choice,
     }
 
-    query = db.query(App)
-    query = apply_filters_to_query(query, filters, db)
+    fields = parse_fields(fields)
+
+    if column_store.APPS_COLUMN_STORE and (after is None or sort_by == "id"):
+        return get_apps_from_column_store(db, filters, page, per_page, after, fields)
+
+    if after is not None:
+        sort_column = resolve_sort_column(App, sort_by, APP_SORT_COLUMNS)
+        statement = apply_filters_to_query(select(*app_columns(fields, sort_by, "id")), filters, db)
+        rows = fetch_keyset_rows(lambda segment: db.execute(segment).all(),
+                                 keyset_segments(statement, sort_column, App.id, after), per_page)
+        rows, next_cursor = split_keyset_page(rows, per_page, sort_by)
+        return OrjsonResponse({
+            "apps": rows_to_dicts(rows, fields),
+            "next_cursor": next_cursor,
+        })
 
+    statement = apply_filters_to_query(select(*app_columns(fields)), filters, db)
     offset = (page - 1) * per_page
-    apps = query.offset(offset).limit(per_page).all()
-    total_apps = query.count()
+    rows = db.execute(statement.offset(offset).limit(per_page)).all()
+    total_apps, approximate = count_rows(db, statement, App.__tablename__, filters, count_mode)
+    total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
+
+    return OrjsonResponse({
+        "apps": rows_to_dicts(rows, fields),
+        "total_apps": total_apps,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": approximate,
+    })
+
+
+def get_apps_from_column_store(db: SessionLocal, filters: dict, page: int, per_page: int, after: Optional[str],
+                               fields: list):
+    category = filters["category"]
+    conditions = analytics.filter_conditions(filters, get_category_id(db, category) if category else None)
+
+    if after is not None:
+        after_id = decode_cursor(after)[1] if after else 0
+        ids = column_store.app_store.page_after(conditions, after_id, per_page + 1)
+        rows, next_cursor = split_keyset_page(load_app_rows_by_id(db, ids, fields), per_page, "id")
+        return OrjsonResponse({
+            "apps": rows_to_dicts(rows, fields),
+            "next_cursor": next_cursor,
+        })
+
+    ids, total_apps = column_store.app_store.page(conditions, (page - 1) * per_page, per_page)
+    total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
+    return OrjsonResponse({
+        "apps": rows_to_dicts(load_app_rows_by_id(db, ids, fields), fields),
+        "total_apps": total_apps,
+        "total_pages": total_pages,
+        "current_page": page,
+        "approximate": False,
+    })
+
+
+def load_app_rows_by_id(db: SessionLocal, ids: list, fields: list) -> list:
+    if not ids:
+        return []
+    return db.execute(select(*app_columns(fields, "id")).where(App.id.in_(ids)).order_by(App.id)).all()
+
+
+@app.get("/apps/search", response_model=dict)
+def search_apps(
+        q: str = Query(..., min_length=search.SEARCH_MIN_LENGTH),
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        page: Optional[int] = Query(1, ge=1),
+        per_page: Optional[int] = Query(100, ge=1),
+        db: SessionLocal = Depends(get_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    statement = apply_filters_to_query(select(App), filters, db)
+    page_statement, count_statement = search.search_statements(statement, q.strip(), (page - 1) * per_page, per_page)
+    apps = db.execute(page_statement).scalars().all()
+    total_apps = db.execute(count_statement).scalar()
     total_pages = (total_apps // per_page) + (1 if total_apps % per_page > 0 else 0)
 
     return {
@@ -82,9 +228,72 @@ def get_filtered_apps(
         "total_apps": total_apps,
         "total_pages": total_pages,
         "current_page": page,
+        "approximate": total_apps >= search.SEARCH_MAX_CANDIDATES,
     }
 
 
+@app.get("/apps/export")
+def export_filtered_apps(
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        export_format: Optional[str] = Query("ndjson", alias="format", pattern="^(ndjson|csv|arrow)$"),
+        fields: Optional[str] = Query(None),
+        db: SessionLocal = Depends(get_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    fields = parse_fields(fields)
+    statement = apply_filters_to_query(select(*app_columns(fields)), filters, db).order_by(App.id)
+    media_type, extension = export.EXPORT_FORMATS[export_format]
+    return StreamingResponse(export.export_apps(statement, fields, export_format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=apps.{extension}"})
+
+
+@app.get("/suggest", response_model=List[dict])
+def get_suggestions(
+        q: str = Query(..., min_length=1),
+        kind: Optional[str] = Query(None, pattern="^(app|developer)$"),
+        limit: Optional[int] = Query(10, ge=1, le=suggest.SUGGEST_MAX_LIMIT)
+):
+    return suggest.suggest(q, [kind] if kind else list(suggest.SOURCES), limit)
+
+
+@app.post("/statistics/batch", response_model=List[dict])
+def get_statistics_batch(statistics: List[StatisticRequestModel], db: SessionLocal = Depends(get_db)):
+    statistics_batch.check_size(statistics)
+    results = [None] * len(statistics)
+    for key, group in statistics_batch.group_by_filters(statistics).items():
+        filters = dict(key)
+        category_id = get_category_id(db, filters["category"]) if filters.get("category") else None
+        computed = statistics_batch.compute(db, {item.statistic for _, item in group}, filters, category_id)
+        for index, item in group:
+            results[index] = {"statistic": item.statistic, "filters": filters, "result": computed[item.statistic]}
+    return results
+
+
 @app.get("/statistics/rating_distribution", response_model=List[dict])
 def get_rating_distribution(
         category: Optional[str] = Query(None),
@@ -116,18 +325,72 @@ def get_rating_distribution(
         "editors_choice": editors_choice,
     }
 
-    query = db.query(App.rating, func.count().label('count')) \
-        .group_by(App.rating) \
-        .order_by(App.rating)
+    if analytics.enabled("rating_distribution"):
+        return analytics.rating_distribution(filters, get_category_id(db, category) if category else None)
+
+    if rollups.STATISTICS_ROLLUP and not any(value for key, value in filters.items() if key != "category"):
+        return rollups.rating_distribution(db, get_category_id(db, category) if category else None)
+
+    query = db.query(RATING_BUCKET, func.count().label('count')) \
+        .group_by(RATING_BUCKET) \
+        .order_by(RATING_BUCKET)
 
     query = apply_filters_to_query(query, filters, db)
 
     result = query.all()
-    return [{"rating": round(rating, 1), "count": count} for rating, count in result]
+    return [{"rating": float(rating), "count": count} for rating, count in result]
+
+
+@app.get("/statistics/histogram", response_model=dict)
+def get_histogram(
+        column: str = Query(..., pattern="^(rating|price|installs|size|rating_count)$"),
+        buckets: Optional[int] = Query(None, ge=1, le=histogram.HISTOGRAM_MAX_BUCKETS),
+        width: Optional[float] = Query(None, gt=0),
+        log: Optional[bool] = Query(None),
+        category: Optional[str] = Query(None),
+        min_rating: Optional[float] = Query(None),
+        max_rating: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None),
+        max_price: Optional[float] = Query(None),
+        min_installs: Optional[int] = Query(None),
+        max_installs: Optional[int] = Query(None),
+        content_rating: Optional[str] = Query(None),
+        free: Optional[bool] = Query(None),
+        ad_supported: Optional[bool] = Query(None),
+        in_app_purchases: Optional[bool] = Query(None),
+        editors_choice: Optional[bool] = Query(None),
+        db: SessionLocal = Depends(get_db)
+):
+    filters = {
+        "category": category,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_installs": min_installs,
+        "max_installs": max_installs,
+        "content_rating": content_rating,
+        "free": free,
+        "ad_supported": ad_supported,
+        "in_app_purchases": in_app_purchases,
+        "editors_choice": editors_choice,
+    }
+
+    buckets = histogram.check_bins(buckets, width)
+    log = column in histogram.LOG_SCALE_COLUMNS if log is None else log
+    statement = histogram.histogram_statement(column, filters, get_category_id(db, category) if category else None,
+                                              buckets, width, log)
+    return histogram.histogram(db.execute(statement), column, log)
 
 
 @app.get("/statistics/release_trend", response_model=List[dict])
 def get_app_release_trend(category_name: Optional[str] = None, db: SessionLocal = Depends(get_db)):
+    if analytics.enabled("release_trend"):
+        return analytics.year_trend("release", get_category_id(db, category_name) if category_name else None)
+
+    if rollups.STATISTICS_ROLLUP:
+        return rollups.year_trend(db, "release", get_category_id(db, category_name) if category_name else None)
+
     query = db.query(func.extract('year', App.released).label('year'), func.count().label('count')) \
         .group_by(func.extract('year', App.released)) \
         .order_by('year')
@@ -143,6 +406,12 @@ def get_app_release_trend(category_name: Optional[str] = None, db: SessionLocal
 
 @app.get("/statistics/update_trend", response_model=List[dict])
 def get_app_update_trend(category_name: Optional[str] = None, db: SessionLocal = Depends(get_db)):
+    if analytics.enabled("update_trend"):
+        return analytics.year_trend("update", get_category_id(db, category_name) if category_name else None)
+
+    if rollups.STATISTICS_ROLLUP:
+        return rollups.year_trend(db, "update", get_category_id(db, category_name) if category_name else None)
+
     query = db.query(func.extract('year', App.last_updated).label('year'), func.count().label('count')) \
         .group_by(func.extract('year', App.last_updated)) \
         .order_by('year')
@@ -158,6 +427,14 @@ def get_app_update_trend(category_name: Optional[str] = None, db: SessionLocal =
 
 @app.get("/statistics/average_rating/", response_model=dict)
 def get_average_rating(category_name: Optional[str] = None, db: SessionLocal = Depends(get_db)):
+    if analytics.enabled("average_rating"):
+        avg_rating = analytics.average_rating(get_category_id(db, category_name) if category_name else None)
+        return {"category": category_name or "All", "average_rating": avg_rating}
+
+    if rollups.STATISTICS_ROLLUP:
+        avg_rating = rollups.average_rating(db, get_category_id(db, category_name) if category_name else None)
+        return {"category": category_name or "All", "average_rating": avg_rating}
+
     query = db.query(func.avg(App.rating))
 
     filters = {
@@ -174,6 +451,7 @@ def create_category(category: UpsertCategoryModel, db: SessionLocal = Depends(ge
     db_category = Category(name=category.name)
     db.add(db_category)
     db.commit()
+    invalidate_category_caches()
     db.refresh(db_category)
     return CategoryModel.from_orm(db_category)
 
@@ -183,6 +461,31 @@ def get_categories(db: SessionLocal = Depends(get_db)):
     return [CategoryModel.from_orm(category) for category in db.query(Category).all()]
 
 
+@app.post("/categories/batch", response_model=List[BatchItemResultModel])
+def create_categories_batch(categories: List[UpsertCategoryModel], db: SessionLocal = Depends(get_db)):
+    results, _ = batch.run_batch(db, batch.insert_categories, categories)
+    invalidate_category_caches()
+    return results
+
+
+@app.put("/categories/batch", response_model=List[BatchItemResultModel])
+def update_categories_batch(categories: List[BatchUpdateCategoryModel], db: SessionLocal = Depends(get_db)):
+    results, _ = batch.run_batch(db, batch.update_categories, categories)
+    invalidate_category_caches()
+    return results
+
+
+@app.delete("/categories/batch", response_model=List[BatchItemResultModel])
+def delete_categories_batch(categories: BatchDeleteModel, db: SessionLocal = Depends(get_db)):
+    results, deleted = batch.run_batch(db, batch.delete_categories, categories.ids)
+    invalidate_category_caches()
+    rollups.rollup_cache.invalidate()
+    for db_category in deleted:
+        analytics.category_deleted(db_category.id)
+        column_store.category_deleted(db_category.id)
+    return results
+
+
 @app.get("/categories/{category_id}", response_model=CategoryModel)
 def get_category(category_id: int, db: SessionLocal = Depends(get_db)):
     return CategoryModel.from_orm(db.query(Category).filter(Category.id == category_id).first())
@@ -194,6 +497,7 @@ def update_category(category_id: int, category: UpsertCategoryModel, db: Session
     if db_category:
         db_category.name = category.name
         db.commit()
+        invalidate_category_caches()
         db.refresh(db_category)
         return CategoryModel.from_orm(db_category)
     return None
@@ -203,8 +507,13 @@ def update_category(category_id: int, category: UpsertCategoryModel, db: Session
 def delete_category(category_id: int, db: SessionLocal = Depends(get_db)):
     db_category = db.query(Category).filter(Category.id == category_id).first()
     if db_category:
+        rollups.reassign_category(db, category_id)
         db.delete(db_category)
         db.commit()
+        invalidate_category_caches()
+        rollups.rollup_cache.invalidate()
+        analytics.category_deleted(category_id)
+        column_store.category_deleted(category_id)
         return CategoryModel.from_orm(db_category)
     return None
 
@@ -215,6 +524,7 @@ def create_developer(developer: UpsertDeveloperModel, db: SessionLocal = Depends
     db.add(db_developer)
     db.commit()
     db.refresh(db_developer)
+    suggest.developer_saved(db_developer)
     return DeveloperModel.from_orm(db_developer)
 
 
@@ -222,9 +532,21 @@ def create_developer(developer: UpsertDeveloperModel, db: SessionLocal = Depends
 def get_developers(
         page: Optional[int] = Query(1, ge=1),
         per_page: Optional[int] = Query(10, ge=1),
+        after: Optional[str] = Query(None),
+        sort_by: Optional[str] = Query("id"),
+        count_mode: Optional[str] = Query(None),
         db: SessionLocal = Depends(get_db)
 ):
-    total_developers = db.query(Developer).count()
+    if after is not None:
+        sort_column = resolve_sort_column(Developer, sort_by, DEVELOPER_SORT_COLUMNS)
+        developers, next_cursor = fetch_keyset_page(db.query(Developer), sort_column, Developer.id, after, per_page,
+                                                    sort_by)
+        return {
+            "developers": [DeveloperModel.from_orm(developer) for developer in developers],
+            "next_cursor": next_cursor,
+        }
+
+    total_developers, approximate = count_rows(db, select(Developer), Developer.__tablename__, {}, count_mode)
     total_pages = (total_developers // per_page) + (1 if total_developers % per_page > 0 else 0)
 
     offset = (page - 1) * per_page
@@ -235,9 +557,34 @@ def get_developers(
         "total_developers": total_developers,
         "total_pages": total_pages,
         "current_page": page,
+        "approximate": approximate,
     }
 
 
+@app.post("/developers/batch", response_model=List[BatchItemResultModel])
+def create_developers_batch(developers: List[UpsertDeveloperModel], db: SessionLocal = Depends(get_db)):
+    results, saved = batch.run_batch(db, batch.insert_developers, developers)
+    for db_developer in saved:
+        suggest.developer_saved(db_developer)
+    return results
+
+
+@app.put("/developers/batch", response_model=List[BatchItemResultModel])
+def update_developers_batch(developers: List[BatchUpdateDeveloperModel], db: SessionLocal = Depends(get_db)):
+    results, saved = batch.run_batch(db, batch.update_developers, developers)
+    for db_developer in saved:
+        suggest.developer_saved(db_developer)
+    return results
+
+
+@app.delete("/developers/batch", response_model=List[BatchItemResultModel])
+def delete_developers_batch(developers: BatchDeleteModel, db: SessionLocal = Depends(get_db)):
+    results, deleted = batch.run_batch(db, batch.delete_developers, developers.ids)
+    for db_developer in deleted:
+        suggest.developer_deleted(db_developer.id)
+    return results
+
+
 @app.get("/developers/{developer_id}", response_model=DeveloperModel)
 def get_developer(developer_id: int, db: SessionLocal = Depends(get_db)):
     return DeveloperModel.from_orm(db.query(Developer).filter(Developer.id == developer_id).first())
@@ -251,6 +598,7 @@ def update_developer(developer_id: int, developer: UpsertDeveloperModel, db: Ses
         db_developer.email = developer.email
         db.commit()
         db.refresh(db_developer)
+        suggest.developer_saved(db_developer)
         return DeveloperModel.from_orm(db_developer)
     return None
 
@@ -261,6 +609,7 @@ def delete_developer(developer_id: int, db: SessionLocal = Depends(get_db)):
     if db_developer:
         db.delete(db_developer)
         db.commit()
+        suggest.developer_deleted(developer_id)
         return DeveloperModel.from_orm(db_developer)
     return None
 
@@ -290,11 +639,50 @@ def create_app(app: UpsertAppModel, db: SessionLocal = Depends(get_db)):
         editors_choice=False
     )
     db.add(db_app)
+    rollups.apply_app_delta(db, rollups.snapshot_app(db_app), 1)
     db.commit()
+    invalidate_app_caches()
     db.refresh(db_app)
+    analytics.app_saved(db_app)
+    column_store.app_saved(db_app)
+    suggest.app_saved(db_app)
     return AppModel.from_orm(db_app)
 
 
+@app.post("/apps/batch", response_model=List[BatchItemResultModel])
+def upsert_apps_batch(apps: List[BatchUpsertAppModel], db: SessionLocal = Depends(get_db)):
+    results, saved = batch.run_batch(db, batch.upsert_apps, apps)
+    invalidate_app_caches()
+    apps_saved(saved)
+    return results
+
+
+@app.put("/apps/batch", response_model=List[BatchItemResultModel])
+def update_apps_batch(apps: List[BatchUpdateAppModel], db: SessionLocal = Depends(get_db)):
+    results, saved = batch.run_batch(db, batch.update_apps, apps)
+    invalidate_app_caches()
+    apps_saved(saved)
+    return results
+
+
+@app.delete("/apps/batch", response_model=List[BatchItemResultModel])
+def delete_apps_batch(apps: BatchDeleteModel, db: SessionLocal = Depends(get_db)):
+    results, deleted = batch.run_batch(db, batch.delete_apps, apps.ids)
+    invalidate_app_caches()
+    for db_app in deleted:
+        analytics.app_deleted(db_app.id)
+        column_store.app_deleted(db_app.id)
+        suggest.app_deleted(db_app.id)
+    return results
+
+
+def apps_saved(saved: list):
+    for db_app in saved:
+        analytics.app_saved(db_app)
+        column_store.app_saved(db_app)
+        suggest.app_saved(db_app)
+
+
 @app.get("/apps/{app_id}", response_model=AppModel)
 def get_app(app_id: int, db: SessionLocal = Depends(get_db)):
     return AppModel.from_orm(db.query(App).filter(App.id == app_id).first())
@@ -304,6 +692,7 @@ def get_app(app_id: int, db: SessionLocal = Depends(get_db)):
 def update_app(app_id: int, app: UpsertAppModel, db: SessionLocal = Depends(get_db)):
     db_app = db.query(App).filter(App.id == app_id).first()
     if db_app:
+        rollups.apply_app_delta(db, rollups.snapshot_app(db_app), -1)
         db_app.app_name = app.app_name
         db_app.category_id = app.category_id
         db_app.developer_id = app.developer_id
@@ -323,8 +712,13 @@ def update_app(app_id: int, app: UpsertAppModel, db: SessionLocal = Depends(get_
         db_app.ad_supported = app.ad_supported
         db_app.in_app_purchases = app.in_app_purchases
         db_app.editors_choice = app.editors_choice
+        rollups.apply_app_delta(db, rollups.snapshot_app(db_app), 1)
         db.commit()
+        invalidate_app_caches()
         db.refresh(db_app)
+        analytics.app_saved(db_app)
+        column_store.app_saved(db_app)
+        suggest.app_saved(db_app)
         return AppModel.from_orm(db_app)
     return None
 
@@ -333,15 +727,35 @@ def update_app(app_id: int, app: UpsertAppModel, db: SessionLocal = Depends(get_
 def delete_app(app_id: int, db: SessionLocal = Depends(get_db)):
     db_app = db.query(App).filter(App.id == app_id).first()
     if db_app:
+        rollups.apply_app_delta(db, rollups.snapshot_app(db_app), -1)
         db.delete(db_app)
         db.commit()
+        invalidate_app_caches()
+        analytics.app_deleted(app_id)
+        column_store.app_deleted(app_id)
+        suggest.app_deleted(app_id)
         return AppModel.from_orm(db_app)
     return None
 
 
+def invalidate_app_caches():
+    filters_cache.invalidate()
+    rollups.rollup_cache.invalidate()
+
+
+def invalidate_category_caches():
+    filters_cache.invalidate()
+    category_ids_cache.invalidate()
+
+
 def get_category_id(db: SessionLocal, category_name: str) -> Optional[int]:
-    category_id = db.query(Category.id).filter(Category.name == category_name).first()
-    return category_id[0] if category_id else None
+    category_id = category_ids_cache.get(lambda: load_category_ids(db)).get(category_name)
+    if category_id is None:
+        # created by another process since the dictionary was loaded; an unknown name leaves the filter out
+        category_id = db.query(Category.id).filter(Category.name == category_name).scalar()
+        if category_id is not None:
+            category_ids_cache.invalidate()
+    return category_id
 
 
 def apply_filters_to_query(
@@ -350,30 +764,10 @@ def apply_filters_to_query(
         db: SessionLocal
 ):
     category_id = get_category_id(db, filters.get("category")) if filters.get("category") else None
+    return apply_filters(query, filters, category_id)
+
+
+if DB_ASYNC:
+    from async_api import install_async_routes
 
-    if category_id:
-        query = query.filter(App.category_id == category_id)
-    if filters.get("min_rating"):
-        query = query.filter(App.rating >= filters["min_rating"])
-    if filters.get("max_rating"):
-        query = query.filter(App.rating <= filters["max_rating"])
-    if filters.get("min_price"):
-        query = query.filter(App.price >= filters["min_price"])
-    if filters.get("max_price"):
-        query = query.filter(App.price <= filters["max_price"])
-    if filters.get("min_installs"):
-        query = query.filter(App.installs >= filters["min_installs"])
-    if filters.get("max_installs"):
-        query = query.filter(App.installs <= filters["max_installs"])
-    if filters.get("content_rating"):
-        query = query.filter(App.content_rating == filters["content_rating"])
-    if filters.get("free"):
-        query = query.filter(App.free == filters["free"])
-    if filters.get("ad_supported"):
-        query = query.filter(App.ad_supported == filters["ad_supported"])
-    if filters.get("in_app_purchases"):
-        query = query.filter(App.in_app_purchases == filters["in_app_purchases"])
-    if filters.get("editors_choice"):
-        query = query.filter(App.editors_choice == filters["editors_choice"])
-
-    return query
+    install_async_routes(app)
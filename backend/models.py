@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import field_serializer, BaseModel
 
@@ -92,3 +92,76 @@ class UpsertDeveloperModel(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class BatchAppFieldsModel(BaseModel):
+    category_id: Optional[int] = None
+    developer_id: Optional[int] = None
+    rating: Optional[float] = None
+    rating_count: Optional[int] = None
+    installs: Optional[int] = None
+    min_installs: Optional[int] = None
+    max_installs: Optional[int] = None
+    free: Optional[bool] = None
+    price: Optional[float] = None
+    currency: Optional[str] = None
+    size: Optional[float] = None
+    min_android: Optional[str] = None
+    released: Optional[date] = None
+    last_updated: Optional[date] = None
+    content_rating: Optional[str] = None
+    ad_supported: Optional[bool] = None
+    in_app_purchases: Optional[bool] = None
+    editors_choice: Optional[bool] = None
+
+
+class BatchUpsertAppModel(BatchAppFieldsModel):
+    app_id: str
+    app_name: str
+
+
+class BatchUpdateAppModel(BatchAppFieldsModel):
+    id: int
+    app_id: Optional[str] = None
+    app_name: Optional[str] = None
+
+
+class BatchUpdateCategoryModel(BaseModel):
+    id: int
+    name: str
+
+
+class BatchUpdateDeveloperModel(BaseModel):
+    id: int
+    name: str
+    email: str
+
+
+class BatchDeleteModel(BaseModel):
+    ids: List[int]
+
+
+class BatchItemResultModel(BaseModel):
+    index: int
+    id: Optional[int]
+    status: str
+
+
+class StatisticsFiltersModel(BaseModel):
+    category: Optional[str] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_installs: Optional[int] = None
+    max_installs: Optional[int] = None
+    content_rating: Optional[str] = None
+    free: Optional[bool] = None
+    ad_supported: Optional[bool] = None
+    in_app_purchases: Optional[bool] = None
+    editors_choice: Optional[bool] = None
+
+
+class StatisticRequestModel(BaseModel):
+    statistic: Literal["rating_distribution", "release_trend", "update_trend", "average_rating"]
+    filters: StatisticsFiltersModel = StatisticsFiltersModel()
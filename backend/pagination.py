@@ -0,0 +1,94 @@
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# only columns with a (column, id) index in sql/indexes.sql, so every page is a range scan of that index
+APP_SORT_COLUMNS = ("id", "rating", "installs")
+DEVELOPER_SORT_COLUMNS = ("id",)
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    payload = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def resolve_sort_column(entity, sort_by: str, sortable: tuple):
+    if sort_by not in sortable:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_by}', expected one of {list(sortable)}")
+    return getattr(entity, sort_by)
+
+
+def coerce_cursor_value(sort_column, sort_value):
+    # a value of the wrong type would only fail in the database, as a 500
+    if sort_value is None:
+        return None
+    python_type = sort_column.type.python_type
+    if isinstance(sort_value, bool):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if python_type is float and isinstance(sort_value, (int, float)):
+        return float(sort_value)
+    if not isinstance(sort_value, python_type):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return sort_value
+
+
+def keyset_segments(query, sort_column, id_column, after: str) -> list:
+    # NULL sort values come last, ordered by id. They are read by a second statement once the non-NULL ones run
+    # out: a single statement ORing both conditions could not use the row comparison as an index condition
+    sort_value, row_id = decode_cursor(after) if after else (None, None)
+    if sort_column is id_column:
+        return [(query.filter(id_column > row_id) if after else query).order_by(id_column)]
+    nulls = query.filter(sort_column.is_(None))
+    if after and sort_value is None:
+        return [nulls.filter(id_column > row_id).order_by(id_column)]
+    if after:
+        sort_value = coerce_cursor_value(sort_column, sort_value)
+        values = query.filter(tuple_(sort_column, id_column) > tuple_(sort_value, row_id))
+    else:
+        values = query.filter(sort_column.is_not(None))
+    return [values.order_by(sort_column, id_column), nulls.order_by(id_column)]
+
+
+def fetch_keyset_rows(run, segments: list, per_page: int) -> list:
+    # one row past the page tells whether there is a next one
+    rows = []
+    for segment in segments:
+        rows.extend(run(segment.limit(per_page + 1 - len(rows))))
+        if len(rows) > per_page:
+            break
+    return rows
+
+
+async def fetch_keyset_rows_async(run, segments: list, per_page: int) -> list:
+    rows = []
+    for segment in segments:
+        rows.extend(await run(segment.limit(per_page + 1 - len(rows))))
+        if len(rows) > per_page:
+            break
+    return rows
+
+
+def fetch_keyset_page(query, sort_column, id_column, after: str, per_page: int, sort_key: str):
+    rows = fetch_keyset_rows(lambda segment: segment.all(), keyset_segments(query, sort_column, id_column, after),
+                             per_page)
+    return split_keyset_page(rows, per_page, sort_key)
+
+
+def split_keyset_page(rows: list, per_page: int, sort_key: str):
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_key), last.id)
+    return rows, next_cursor
@@ -0,0 +1,87 @@
+import argparse
+import io
+import time
+
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+from database import engine, SessionLocal
+from columnar import APPS_PARQUET_PATH, read_apps
+from import_data import copy_chunk
+from rollups import STATISTICS_ROLLUP, refresh_rollups
+
+APP_COLUMNS = [
+    "id", "app_id", "app_name", "category_id", "developer_id", "rating", "rating_count",
+    "installs", "min_installs", "max_installs", "free", "price", "currency",
+    "size", "min_android", "released", "last_updated", "content_rating",
+    "ad_supported", "in_app_purchases", "editors_choice", "scraped_time"
+]
+
+
+def partition_name(category_id: int) -> str:
+    return f"apps_category_{int(category_id)}"
+
+
+def swap_category_partition(connection, category_id: int, data: bytes) -> int:
+    # the replacement is loaded and indexed next to the live partition in its own transaction, so the swap
+    # only holds the apps lock for the DETACH/ATTACH instead of a DELETE and re-insert of the whole category
+    cursor = connection.cursor()
+    live = partition_name(category_id)
+    staging = f"{live}_staging"
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    cursor.execute(f"CREATE TABLE {staging} (LIKE apps INCLUDING DEFAULTS INCLUDING INDEXES)")
+    copy_chunk(cursor, f"COPY {staging} ({', '.join(APP_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", data)
+    # a matching CHECK constraint lets ATTACH skip its validation scan
+    cursor.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_category "
+                   f"CHECK (category_id IS NOT NULL AND category_id = {int(category_id)})")
+    cursor.execute(f"ANALYZE {staging}")
+    connection.commit()
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (live,))
+    if cursor.fetchone()[0]:
+        cursor.execute(f"ALTER TABLE apps DETACH PARTITION {live}")
+        cursor.execute(f"DROP TABLE {live}")
+    cursor.execute(f"ALTER TABLE apps ATTACH PARTITION {staging} FOR VALUES IN ({int(category_id)})")
+    cursor.execute(f"ALTER TABLE {staging} RENAME TO {live}")
+    cursor.execute(f"ALTER TABLE {live} DROP CONSTRAINT {staging}_category")
+    cursor.execute("SELECT setval(pg_get_serial_sequence('apps', 'id'), GREATEST((SELECT MAX(id) FROM apps), "
+                   "pg_sequence_last_value(pg_get_serial_sequence('apps', 'id')::regclass)))")
+    cursor.execute(f"SELECT COUNT(*) FROM {live}")
+    rows = cursor.fetchone()[0]
+    connection.commit()
+    return rows
+
+
+def category_csv(category_id: int, parquet_path: str) -> bytes:
+    table = read_apps(APP_COLUMNS, filter=ds.field("category_id") == category_id, path=parquet_path)
+    buffer = io.BytesIO()
+    pacsv.write_csv(table.select(APP_COLUMNS), buffer, pacsv.WriteOptions(include_header=False))
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reload the apps of one category by swapping its partition")
+    parser.add_argument("--category-id", type=int, required=True)
+    parser.add_argument("--parquet-path", default=APPS_PARQUET_PATH,
+                        help="category-partitioned Parquet dataset written by pipeline/cleaning.py --parquet")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    data = category_csv(args.category_id, args.parquet_path)
+    connection = engine.raw_connection()
+    try:
+        rows = swap_category_partition(connection, args.category_id, data)
+    finally:
+        connection.close()
+    print(f"Swapped in {rows} apps for category {args.category_id} in {time.time() - start_time:.1f} seconds")
+
+    if STATISTICS_ROLLUP:
+        db = SessionLocal()
+        try:
+            refresh_rollups(db)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+
+CACHED_PREFIXES = ("/statistics/", "/categories", "/developers", "/filters", "/apps")
+# streamed without a size bound, or already answered from memory
+UNCACHED_PATHS = ("/apps/export", "/suggest")
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# POSTed only because the request has a body, they change nothing
+READ_ONLY_POSTS = ("/statistics/batch",)
+
+
+def cache_key(path: str, query_string: bytes) -> str:
+    # parameter order and percent-encoding do not change the response, so they do not change the key either
+    query = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    return f"{path}?{urlencode(query)}" if query else path
+
+
+def is_cached_path(path: str) -> bool:
+    return path.startswith(CACHED_PREFIXES) and not path.startswith(UNCACHED_PATHS)
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body", "etag", "expires", "size")
+
+    def __init__(self, status: int, headers: list, body: bytes, expires: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = next((value for name, value in headers if name == b"etag"), None)
+        self.expires = expires
+        self.size = len(body) + sum(len(name) + len(value) for name, value in headers)
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, generation: int, status: int, headers: list, body: bytes):
+        entry = CachedResponse(status, headers, body, time.monotonic() + self.ttl)
+        if entry.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            # a write that finished while the response was built leaves it uncached
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def bump(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key).size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": RESPONSE_CACHE,
+                "generation": self.generation,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+class ResponseCacheMiddleware:
+    # serves repeated GETs of the read endpoints from memory; every write request bumps the generation, which
+    # drops all cached responses and keeps responses built concurrently with the write from being stored
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] in WRITE_METHODS and scope["path"] not in READ_ONLY_POSTS:
+            started = False
+
+            async def bump_then_send(message):
+                nonlocal started
+                # before the client sees the response, so its next read cannot be served the old one
+                if message["type"] == "http.response.start":
+                    started = True
+                    self.cache.bump()
+                await send(message)
+
+            try:
+                await self.app(scope, receive, bump_then_send)
+            finally:
+                # a write that failed before responding may still have changed something
+                if not started:
+                    self.cache.bump()
+            return
+        if scope["method"] != "GET" or not is_cached_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope["path"], scope["query_string"])
+        entry = self.cache.get(key)
+        if entry is not None:
+            await self.send_cached(scope, send, entry)
+            return
+
+        generation = self.cache.generation
+        start = None
+        chunks = []
+        size = 0
+
+        async def capture(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message if message["status"] == 200 else None
+                await send({**message, "headers": [*message["headers"], (b"x-cache", b"MISS")]})
+                return
+            await send(message)
+            if message["type"] != "http.response.body" or start is None:
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > self.cache.max_entry_bytes:
+                # too big to cache, stop buffering the rest of it
+                start = None
+                chunks.clear()
+            elif not message.get("more_body", False):
+                self.cache.put(key, generation, start["status"], list(start["headers"]), b"".join(chunks))
+
+        await self.app(scope, receive, capture)
+
+    @staticmethod
+    async def send_cached(scope, send, entry: CachedResponse):
+        request_etag = next((value for name, value in scope["headers"] if name == b"if-none-match"), None)
+        if entry.etag is not None and request_etag == entry.etag:
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [(b"etag", entry.etag), (b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": entry.status,
+                    "headers": [*entry.headers, (b"x-cache", b"HIT")]})
+        await send({"type": "http.response.body", "body": entry.body})
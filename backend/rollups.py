@@ -0,0 +1,266 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional
+
+from sqlalchemy import event, text
+
+from cache import VersionedCache
+from database import SessionLocal, engine
+
+STATISTICS_ROLLUP = os.getenv("STATISTICS_ROLLUP", "false").lower() in ("1", "true", "yes")
+# how often a read checks rollup_version for writes made by other processes
+ROLLUP_VERSION_CHECK_SECONDS = float(os.getenv("ROLLUP_VERSION_CHECK_SECONDS", "1"))
+
+# a sequence rather than a row, so writers never wait on each other to bump it
+BUMP_VERSION = "SELECT nextval('rollup_version')"
+
+# category_id 0 stands for apps without a category, the rollup keys cannot be NULL
+REFRESH_STATEMENTS = [
+    "LOCK TABLE app_release_stats, app_update_stats, app_rating_stats, category_rating_stats IN EXCLUSIVE MODE",
+    "DELETE FROM app_release_stats",
+    "DELETE FROM app_update_stats",
+    "DELETE FROM app_rating_stats",
+    "DELETE FROM category_rating_stats",
+    """
+    INSERT INTO app_release_stats (category_id, year, app_count)
+    SELECT COALESCE(category_id, 0), EXTRACT(YEAR FROM released)::int, COUNT(*)
+    FROM apps WHERE released IS NOT NULL
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO app_update_stats (category_id, year, app_count)
+    SELECT COALESCE(category_id, 0), EXTRACT(YEAR FROM last_updated)::int, COUNT(*)
+    FROM apps WHERE last_updated IS NOT NULL
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO app_rating_stats (category_id, rating_bucket, app_count)
+    SELECT COALESCE(category_id, 0), ROUND(rating::numeric, 1), COUNT(*)
+    FROM apps WHERE rating IS NOT NULL
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO category_rating_stats (category_id, rating_sum, rating_count)
+    SELECT COALESCE(category_id, 0), SUM(rating), COUNT(rating)
+    FROM apps
+    GROUP BY 1
+    """,
+]
+
+UPSERT_RELEASE = text("""
+    INSERT INTO app_release_stats (category_id, year, app_count) VALUES (:category_id, :year, :delta)
+    ON CONFLICT (category_id, year) DO UPDATE SET app_count = app_release_stats.app_count + EXCLUDED.app_count
+""")
+UPSERT_UPDATE = text("""
+    INSERT INTO app_update_stats (category_id, year, app_count) VALUES (:category_id, :year, :delta)
+    ON CONFLICT (category_id, year) DO UPDATE SET app_count = app_update_stats.app_count + EXCLUDED.app_count
+""")
+UPSERT_RATING = text("""
+    INSERT INTO app_rating_stats (category_id, rating_bucket, app_count) VALUES (:category_id, :bucket, :delta)
+    ON CONFLICT (category_id, rating_bucket) DO UPDATE SET app_count = app_rating_stats.app_count + EXCLUDED.app_count
+""")
+UPSERT_AVERAGE = text("""
+    INSERT INTO category_rating_stats (category_id, rating_sum, rating_count) VALUES (:category_id, :rating, :delta)
+    ON CONFLICT (category_id) DO UPDATE SET
+        rating_sum = category_rating_stats.rating_sum + EXCLUDED.rating_sum,
+        rating_count = category_rating_stats.rating_count + EXCLUDED.rating_count
+""")
+
+ROLLUP_TABLES = [
+    ("app_release_stats", ["year"], ["app_count"]),
+    ("app_update_stats", ["year"], ["app_count"]),
+    ("app_rating_stats", ["rating_bucket"], ["app_count"]),
+    ("category_rating_stats", [], ["rating_sum", "rating_count"]),
+]
+
+rollup_cache = VersionedCache()
+_version_lock = threading.Lock()
+_seen_version = {"version": None, "checked_at": float("-inf")}
+
+
+def rating_bucket(rating: float) -> Decimal:
+    return Decimal(str(rating)).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+
+
+def mark_changed(db):
+    db.info["rollups_changed"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def bump_version(session):
+    # nextval is not transactional, so it is bumped only once the rollup change is committed; bumped earlier, a
+    # reader could reload the old rollups under the new version and keep them
+    if session.info.pop("rollups_changed", False):
+        with engine.connect() as connection:
+            connection.execute(text(BUMP_VERSION))
+            connection.commit()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def forget_changes(session):
+    session.info.pop("rollups_changed", None)
+
+
+def snapshot_app(db_app) -> dict:
+    return {
+        "category_id": db_app.category_id or 0,
+        "released_year": db_app.released.year if db_app.released else None,
+        "updated_year": db_app.last_updated.year if db_app.last_updated else None,
+        "rating": db_app.rating,
+    }
+
+
+def apply_app_delta(db, snapshot: dict, delta: int):
+    if not STATISTICS_ROLLUP:
+        return
+    category_id = snapshot["category_id"]
+    if snapshot["released_year"] is not None:
+        db.execute(UPSERT_RELEASE, {"category_id": category_id, "year": snapshot["released_year"], "delta": delta})
+    if snapshot["updated_year"] is not None:
+        db.execute(UPSERT_UPDATE, {"category_id": category_id, "year": snapshot["updated_year"], "delta": delta})
+    if snapshot["rating"] is not None:
+        db.execute(UPSERT_RATING, {"category_id": category_id, "bucket": rating_bucket(snapshot["rating"]),
+                                   "delta": delta})
+        db.execute(UPSERT_AVERAGE, {"category_id": category_id, "rating": snapshot["rating"] * delta,
+                                    "delta": delta})
+    mark_changed(db)
+
+
+def apply_app_deltas(db, removed: list, added: list):
+    # the deltas of a whole batch are summed per rollup row first, so each table gets one executemany
+    if not STATISTICS_ROLLUP:
+        return
+    release, update, rating, average = defaultdict(int), defaultdict(int), defaultdict(int), defaultdict(float)
+    average_count = defaultdict(int)
+    for snapshot_list, delta in ((removed, -1), (added, 1)):
+        for snapshot in snapshot_list:
+            category_id = snapshot["category_id"]
+            if snapshot["released_year"] is not None:
+                release[(category_id, snapshot["released_year"])] += delta
+            if snapshot["updated_year"] is not None:
+                update[(category_id, snapshot["updated_year"])] += delta
+            if snapshot["rating"] is not None:
+                rating[(category_id, rating_bucket(snapshot["rating"]))] += delta
+                average[category_id] += snapshot["rating"] * delta
+                average_count[category_id] += delta
+
+    for statement, counts, key in ((UPSERT_RELEASE, release, "year"), (UPSERT_UPDATE, update, "year"),
+                                   (UPSERT_RATING, rating, "bucket")):
+        params = [{"category_id": category_id, key: value, "delta": delta}
+                  for (category_id, value), delta in counts.items() if delta]
+        if params:
+            db.execute(statement, params)
+    params = [{"category_id": category_id, "rating": average[category_id], "delta": delta}
+              for category_id, delta in average_count.items() if delta or average[category_id]]
+    if params:
+        db.execute(UPSERT_AVERAGE, params)
+    mark_changed(db)
+
+
+def reassign_category(db, category_id: int):
+    # deleting a category sets apps.category_id to NULL, so its counts move to the "no category" bucket
+    if not STATISTICS_ROLLUP:
+        return
+    for table, keys, values in ROLLUP_TABLES:
+        columns = ", ".join(keys + values)
+        conflict = ", ".join(["category_id"] + keys)
+        updates = ", ".join(f"{value} = {table}.{value} + EXCLUDED.{value}" for value in values)
+        db.execute(text(f"""
+            INSERT INTO {table} (category_id, {columns})
+            SELECT 0, {columns} FROM {table} WHERE category_id = :category_id
+            ON CONFLICT ({conflict}) DO UPDATE SET {updates}
+        """), {"category_id": category_id})
+        db.execute(text(f"DELETE FROM {table} WHERE category_id = :category_id"), {"category_id": category_id})
+    mark_changed(db)
+
+
+def load_rollups(db) -> dict:
+    rollups = {
+        "release": defaultdict(dict),
+        "update": defaultdict(dict),
+        "rating": defaultdict(dict),
+        "average": {},
+    }
+    for category_id, year, count in db.execute(text("SELECT category_id, year, app_count FROM app_release_stats")):
+        rollups["release"][category_id][year] = count
+    for category_id, year, count in db.execute(text("SELECT category_id, year, app_count FROM app_update_stats")):
+        rollups["update"][category_id][year] = count
+    for category_id, bucket, count in db.execute(
+            text("SELECT category_id, rating_bucket, app_count FROM app_rating_stats")):
+        rollups["rating"][category_id][float(bucket)] = count
+    for category_id, rating_sum, rating_count in db.execute(
+            text("SELECT category_id, rating_sum, rating_count FROM category_rating_stats")):
+        rollups["average"][category_id] = (rating_sum, rating_count)
+    return rollups
+
+
+def check_version(db):
+    # rollups rebuilt by rollups.py, import_data.py or partitions.py, or changed through another worker, bump
+    # rollup_version
+    now = time.monotonic()
+    with _version_lock:
+        if now - _seen_version["checked_at"] < ROLLUP_VERSION_CHECK_SECONDS:
+            return
+        _seen_version["checked_at"] = now
+    # last_value is already 1 before the first nextval, is_called tells the two apart
+    version = db.execute(text("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM rollup_version")).scalar()
+    with _version_lock:
+        if version != _seen_version["version"]:
+            _seen_version["version"] = version
+            rollup_cache.invalidate()
+
+
+def get_rollups(db) -> dict:
+    check_version(db)
+    return rollup_cache.get(lambda: load_rollups(db))
+
+
+def merge_counts(per_category: dict, category_id: int = None) -> dict:
+    if category_id is not None:
+        return {key: count for key, count in per_category.get(category_id, {}).items() if count}
+    merged = defaultdict(int)
+    for counts in per_category.values():
+        for key, count in counts.items():
+            merged[key] += count
+    return {key: count for key, count in merged.items() if count}
+
+
+def year_trend(db, kind: str, category_id: int = None) -> List[dict]:
+    counts = merge_counts(get_rollups(db)[kind], category_id)
+    return [{"year": year, "count": count} for year, count in sorted(counts.items())]
+
+
+def rating_distribution(db, category_id: int = None) -> List[dict]:
+    counts = merge_counts(get_rollups(db)["rating"], category_id)
+    return [{"rating": rating, "count": count} for rating, count in sorted(counts.items())]
+
+
+def average_rating(db, category_id: int = None) -> Optional[float]:
+    averages = get_rollups(db)["average"]
+    if category_id is not None:
+        rating_sum, rating_count = averages.get(category_id, (0.0, 0))
+    else:
+        rating_sum = sum(value[0] for value in averages.values())
+        rating_count = sum(value[1] for value in averages.values())
+    return rating_sum / rating_count if rating_count else None
+
+
+def refresh_rollups(db):
+    for statement in REFRESH_STATEMENTS:
+        db.execute(text(statement))
+    mark_changed(db)
+    db.commit()
+    rollup_cache.invalidate()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        start_time = time.time()
+        refresh_rollups(db)
+        print(f"Statistics rollups refreshed in {time.time() - start_time:.2f} seconds")
+    finally:
+        db.close()
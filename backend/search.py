@@ -0,0 +1,48 @@
+import os
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import aliased
+
+from entities import App
+
+SEARCH_MIN_LENGTH = 3
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "10000"))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def match_condition(q: str):
+    # every branch is served by the gin_trgm_ops indexes of sql/indexes.sql: substring matches on the name
+    # or package id, and fuzzy matches where some word of the name is close to the query (q <% app_name)
+    pattern = f"%{escape_like(q)}%"
+    return or_(
+        App.app_name.ilike(pattern, escape="\\"),
+        App.app_id.ilike(pattern, escape="\\"),
+        App.app_name.op("%>")(q),
+    )
+
+
+def rank_columns(app, q: str) -> list:
+    name = func.lower(app.app_name)
+    lowered = q.lower()
+    return [
+        case((name == lowered, 0), (name.like(f"{escape_like(lowered)}%", escape="\\"), 1), else_=2),
+        func.word_similarity(q, app.app_name).desc(),
+        app.installs.desc().nulls_last(),
+        app.id,
+    ]
+
+
+def search_statements(statement, q: str, offset: int, limit: int):
+    # the candidates are capped so that a common word matching a large part of the table returns a bounded set, and
+    # the total is reported as approximate; they are ranked before the cap, so exact and prefix matches and the
+    # closest names are the ones kept rather than whichever rows the scan reached first
+    matches = statement.where(match_condition(q))
+    candidates = matches.order_by(*rank_columns(App, q)).limit(SEARCH_MAX_CANDIDATES).subquery()
+    app = aliased(App, candidates)
+    page = select(app).order_by(*rank_columns(app, q)).offset(offset).limit(limit)
+    # the same capped number of matches, counted without ranking them
+    count = select(func.count()).select_from(matches.with_only_columns(App.id).limit(SEARCH_MAX_CANDIDATES).subquery())
+    return page, count
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from entities import App
+from models import AppModel
+
+APP_FIELDS = tuple(AppModel.model_fields)
+
+
+def parse_fields(fields: Optional[str]) -> list:
+    if not fields:
+        return list(APP_FIELDS)
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in APP_FIELDS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, expected any of {list(APP_FIELDS)}")
+    return names
+
+
+def app_columns(fields: list, *required: str) -> list:
+    # keyset paging reads the sort column and id from every row, so they are selected after the requested
+    # fields and left out of the response by rows_to_dicts
+    return [getattr(App, name) for name in dict.fromkeys([*fields, *required])]
+
+
+def rows_to_dicts(rows, fields: list) -> list:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def encode_value(value):
+    # same formats as the AppModel field serializers
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    raise TypeError
+
+
+class OrjsonResponse(JSONResponse):
+    # renders plain dicts of column values straight to bytes, without a pydantic model per row
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=encode_value, option=orjson.OPT_PASSTHROUGH_DATETIME)
@@ -0,0 +1,137 @@
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from starlette.concurrency import run_in_threadpool
+
+from entities import App
+from filtering import apply_filters
+from histogram import RATING_BUCKET
+import analytics
+import rollups
+
+STATISTICS_BATCH_MAX_ITEMS = int(os.getenv("STATISTICS_BATCH_MAX_ITEMS", "50"))
+
+# the column each statistic groups by; average_rating is the empty grouping set, one row over all filtered apps
+GROUP_KEYS = {
+    "rating_distribution": RATING_BUCKET,
+    "release_trend": func.extract('year', App.released),
+    "update_trend": func.extract('year', App.last_updated),
+}
+TREND_KINDS = {"release_trend": "release", "update_trend": "update"}
+
+
+def check_size(items: list):
+    if len(items) > STATISTICS_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {STATISTICS_BATCH_MAX_ITEMS} statistics")
+
+
+def group_by_filters(items: list) -> dict:
+    # statistics asking for the same filters are answered by one statement
+    groups = {}
+    for index, item in enumerate(items):
+        filters = item.filters.model_dump(exclude_none=True)
+        groups.setdefault(tuple(sorted(filters.items())), []).append((index, item))
+    return groups
+
+
+def in_memory(statistic: str, filters: dict, category_id: int = None) -> tuple:
+    # the in-memory engines the single-statistic endpoints use, where they cover the filters
+    category_only = not any(value for key, value in filters.items() if key != "category")
+    if not analytics.enabled(statistic):
+        return False, None
+    if statistic == "rating_distribution":
+        return True, analytics.rating_distribution(filters, category_id)
+    if not category_only:
+        return False, None
+    if statistic == "average_rating":
+        return True, analytics.average_rating(category_id)
+    return True, analytics.year_trend(TREND_KINDS[statistic], category_id)
+
+
+def from_rollups(db, statistic: str, filters: dict, category_id: int = None) -> tuple:
+    # the rollup tables, which only cover a category filter
+    category_only = not any(value for key, value in filters.items() if key != "category")
+    if not rollups.STATISTICS_ROLLUP or not category_only:
+        return False, None
+    if statistic == "rating_distribution":
+        return True, rollups.rating_distribution(db, category_id)
+    if statistic == "average_rating":
+        return True, rollups.average_rating(db, category_id)
+    return True, rollups.year_trend(db, TREND_KINDS[statistic], category_id)
+
+
+def precomputed(db, statistic: str, filters: dict, category_id: int = None) -> tuple:
+    found, result = in_memory(statistic, filters, category_id)
+    return (found, result) if found else from_rollups(db, statistic, filters, category_id)
+
+
+def single_pass_statement(statistics: set, filters: dict, category_id: int = None):
+    # one GROUPING SETS statement, so every statistic of the group comes out of the same scan of apps
+    keys = [statistic for statistic in GROUP_KEYS if statistic in statistics]
+    sets = [tuple_(GROUP_KEYS[statistic]) for statistic in keys]
+    if "average_rating" in statistics:
+        sets.append(tuple_())
+    statement = select(
+        *[GROUP_KEYS[statistic] for statistic in keys],
+        *[func.grouping(GROUP_KEYS[statistic]) for statistic in keys],
+        func.count(),
+        func.avg(App.rating),
+    ).group_by(func.grouping_sets(*sets))
+    return apply_filters(statement, filters, category_id), keys
+
+
+def single_pass_results(rows, keys: list) -> dict:
+    counts = {statistic: [] for statistic in keys}
+    results = {}
+    for row in rows:
+        values, grouped, (count, avg_rating) = row[:len(keys)], row[len(keys):-2], row[-2:]
+        statistic = next((statistic for statistic, flag in zip(keys, grouped) if not flag), "average_rating")
+        if statistic == "average_rating":
+            results[statistic] = avg_rating
+        elif values[keys.index(statistic)] is not None:
+            counts[statistic].append((values[keys.index(statistic)], count))
+    for statistic, pairs in counts.items():
+        pairs.sort()
+        if statistic == "rating_distribution":
+            results[statistic] = [{"rating": float(rating), "count": count} for rating, count in pairs]
+        else:
+            results[statistic] = [{"year": int(year), "count": count} for year, count in pairs]
+    return results
+
+
+def with_category(results: dict, filters: dict) -> dict:
+    if "average_rating" in results:
+        results["average_rating"] = {"category": filters.get("category") or "All",
+                                     "average_rating": results["average_rating"]}
+    return results
+
+
+def compute(db, statistics: set, filters: dict, category_id: int = None) -> dict:
+    results = {}
+    for statistic in statistics:
+        found, result = precomputed(db, statistic, filters, category_id)
+        if found:
+            results[statistic] = result
+    remaining = statistics - results.keys()
+    if remaining:
+        statement, keys = single_pass_statement(remaining, filters, category_id)
+        results.update(single_pass_results(db.execute(statement), keys))
+    return with_category(results, filters)
+
+
+async def compute_async(db, statistics: set, filters: dict, category_id: int = None) -> dict:
+    # the async counterpart of compute: the in-memory engines run in the threadpool, the rollups through run_sync
+    # like the single-statistic async endpoints, and the GROUPING SETS statement on the async connection
+    results = {}
+    for statistic in statistics:
+        found, result = await run_in_threadpool(in_memory, statistic, filters, category_id)
+        if not found:
+            found, result = await db.run_sync(lambda session: from_rollups(session, statistic, filters, category_id))
+        if found:
+            results[statistic] = result
+    remaining = statistics - results.keys()
+    if remaining:
+        statement, keys = single_pass_statement(remaining, filters, category_id)
+        results.update(single_pass_results((await db.execute(statement)).all(), keys))
+    return with_category(results, filters)
@@ -0,0 +1,249 @@
+import io
+import logging
+import os
+import threading
+from bisect import bisect_left
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from database import engine
+from analytics import copy_out
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_PRELOAD = os.getenv("SUGGEST_PRELOAD", "true").lower() in ("1", "true", "yes")
+SUGGEST_COMPACT_ROWS = int(os.getenv("SUGGEST_COMPACT_ROWS", "1000"))
+SUGGEST_MAX_LIMIT = 50
+# prefixes matching more names than this get their top entries precomputed, enough to fill a page of
+# suggestions even when every entry of a full delta shadows one of them
+SUGGEST_HEAVY_PREFIX_ROWS = int(os.getenv("SUGGEST_HEAVY_PREFIX_ROWS", "20000"))
+
+NAMES_SCHEMA = pa.schema([("id", pa.int64()), ("name", pa.string()), ("installs", pa.int64())])
+
+# developers are ranked by the installs of all their apps
+SOURCES = {
+    "app": "SELECT id, app_name AS name, installs FROM apps",
+    "developer": "SELECT d.id, d.name, COALESCE(SUM(a.installs), 0) AS installs "
+                 "FROM developers d LEFT JOIN apps a ON a.developer_id = d.id GROUP BY d.id, d.name",
+}
+
+
+def normalize(value: str) -> str:
+    return value.lower()
+
+
+def load_names(kind: str) -> pa.Table:
+    connection = engine.raw_connection()
+    try:
+        data = copy_out(connection.cursor(), f"COPY ({SOURCES[kind]}) TO STDOUT WITH (FORMAT csv, HEADER)")
+    finally:
+        connection.close()
+    return pacsv.read_csv(
+        io.BytesIO(data),
+        convert_options=pacsv.ConvertOptions(column_types=NAMES_SCHEMA, strings_can_be_null=False),
+    ).select(NAMES_SCHEMA.names)
+
+
+def heavy_prefixes(sorted_keys: pa.Array) -> list:
+    prefixes = []
+    length = 1
+    while True:
+        counts = pc.value_counts(pc.utf8_slice_codeunits(sorted_keys, 0, length))
+        values = counts.field("values")
+        heavy = pc.and_(pc.greater(counts.field("counts"), SUGGEST_HEAVY_PREFIX_ROWS),
+                        pc.equal(pc.utf8_length(values), length))
+        found = values.filter(heavy).to_pylist()
+        if not found:
+            return prefixes
+        prefixes.extend(found)
+        length += 1
+
+
+class PrefixIndex:
+    # immutable snapshot of one kind of name, sorted by lowercased name so a prefix is a contiguous range
+    # found with two binary searches; installs are aligned with it for a top-k selection inside the range
+    def __init__(self, table: pa.Table):
+        table = table.filter(pc.is_valid(table["name"]))
+        keys = pc.utf8_lower(table["name"])
+        order = pc.sort_indices(keys)
+        self.keys = keys.take(order).to_pylist()
+        self.names = table["name"].take(order).to_pylist()
+        self.ids = table["id"].take(order).to_numpy()
+        self.installs = table["installs"].take(order).fill_null(0).to_numpy()
+        self.heavy = {}
+        for prefix in heavy_prefixes(keys.take(order)):
+            low, high = self.range(prefix)
+            self.heavy[prefix] = self.select(low, high, SUGGEST_MAX_LIMIT + SUGGEST_COMPACT_ROWS)
+
+    def range(self, prefix: str) -> tuple:
+        low = bisect_left(self.keys, prefix)
+        return low, bisect_left(self.keys, prefix + "\U0010ffff", low)
+
+    def select(self, low: int, high: int, wanted: int) -> np.ndarray:
+        # positions of the wanted most installed entries of the range, most installed first
+        if wanted < high - low:
+            candidates = np.argpartition(-self.installs[low:high], wanted - 1)[:wanted] + low
+        else:
+            candidates = np.arange(low, high)
+        return candidates[np.argsort(-self.installs[candidates], kind="stable")]
+
+    def top(self, prefix: str, limit: int, hidden: set) -> list:
+        candidates = self.heavy.get(prefix)
+        if candidates is None:
+            low, high = self.range(prefix)
+            candidates = self.select(low, high, limit + len(hidden))
+        matches = []
+        for position in candidates:
+            if len(matches) == limit:
+                break
+            if int(self.ids[position]) not in hidden:
+                matches.append((int(self.installs[position]), int(self.ids[position]), self.names[position]))
+        return matches
+
+    def installs_of(self, item_id: int):
+        positions = np.flatnonzero(self.ids == item_id)
+        return int(self.installs[positions[0]]) if len(positions) else None
+
+
+class SuggestStore:
+    # API writes land in a delta keyed by id, None marking a deleted row; base entries shadowed by the delta
+    # are skipped and the delta is folded into a rebuilt index once it grows past SUGGEST_COMPACT_ROWS
+    def __init__(self, kind: str, loader):
+        self.kind = kind
+        self._loader = loader
+        self._lock = threading.Lock()
+        # one cold load at a time; it is not held with _lock, so writes and warm lookups never wait for it
+        self._load_lock = threading.Lock()
+        self._table = None
+        self._index = None
+        self._delta = {}
+        self._loading = False
+        self._generation = 0
+
+    def _snapshot(self):
+        with self._lock:
+            if self._index is not None:
+                return self._index, dict(self._delta)
+        with self._load_lock:
+            with self._lock:
+                if self._index is not None:
+                    return self._index, dict(self._delta)
+                # writes from here on are kept in the delta and replayed over the loaded rows; one the load already
+                # saw is replayed as the same value
+                self._loading = True
+                self._delta = {}
+                generation = self._generation
+            try:
+                table = self._loader(self.kind)
+                index = PrefixIndex(table)
+            finally:
+                with self._lock:
+                    self._loading = False
+            with self._lock:
+                delta = self._delta
+                for item_id, row in delta.items():
+                    if row is not None and row["installs"] is None:
+                        row["installs"] = index.installs_of(item_id) or 0
+                # a reload during the load asked for newer rows than it read, so it is not kept
+                if generation == self._generation:
+                    self._table = table
+                    self._index = index
+                    if len(delta) >= SUGGEST_COMPACT_ROWS:
+                        self._compact()
+                        return self._index, {}
+                return index, dict(delta)
+
+    def warm_up(self):
+        try:
+            self._snapshot()
+        except Exception:
+            logger.exception("Could not build the %s suggestion index, it is retried on the first request", self.kind)
+
+    def top(self, prefix: str, limit: int) -> list:
+        index, delta = self._snapshot()
+        matches = index.top(prefix, limit, set(delta))
+        matches.extend((row["installs"] or 0, item_id, row["name"]) for item_id, row in delta.items()
+                       if row is not None and normalize(row["name"]).startswith(prefix))
+        return sorted(matches, key=lambda match: (-match[0], match[2], match[1]))[:limit]
+
+    def _write(self, item_id: int, row):
+        with self._lock:
+            if self._index is None and not self._loading:
+                return
+            if row is not None and row["installs"] is None:
+                # a renamed developer keeps the installs of their apps; during a cold load they are filled in from
+                # the loaded index once it is there
+                previous = self._delta.get(item_id)
+                if previous:
+                    row["installs"] = previous["installs"]
+                elif self._index is not None:
+                    row["installs"] = self._index.installs_of(item_id) or 0
+            self._delta[item_id] = row
+            if self._index is not None and len(self._delta) >= SUGGEST_COMPACT_ROWS:
+                self._compact()
+
+    def _compact(self):
+        replaced = pa.array(list(self._delta), pa.int64())
+        kept = self._table.filter(pc.invert(pc.is_in(self._table["id"], value_set=replaced)))
+        rows = [{"id": item_id, **row} for item_id, row in self._delta.items() if row is not None]
+        self._table = pa.concat_tables([kept, pa.Table.from_pylist(rows, schema=NAMES_SCHEMA)])
+        self._index = PrefixIndex(self._table)
+        self._delta = {}
+
+    def upsert(self, item_id: int, name: str, installs=None):
+        self._write(item_id, {"name": name, "installs": installs})
+
+    def delete(self, item_id: int):
+        self._write(item_id, None)
+
+    def reload(self):
+        with self._lock:
+            self._table = None
+            self._index = None
+            self._delta = {}
+            self._generation += 1
+
+
+stores = {kind: SuggestStore(kind, load_names) for kind in SOURCES}
+
+
+def suggest(q: str, kinds: list, limit: int) -> list:
+    prefix = normalize(q.lstrip())
+    matches = []
+    for kind in kinds:
+        matches.extend((installs, kind, item_id, name) for installs, item_id, name in stores[kind].top(prefix, limit))
+    matches.sort(key=lambda match: (-match[0], match[3], match[2]))
+    return [{"type": kind, "id": item_id, "name": name, "installs": installs}
+            for installs, kind, item_id, name in matches[:limit]]
+
+
+def warm_up():
+    if SUGGEST_PRELOAD:
+        for store in stores.values():
+            threading.Thread(target=store.warm_up, daemon=True).start()
+
+
+def reload():
+    for store in stores.values():
+        store.reload()
+
+
+def app_saved(db_app):
+    # the developer store keeps the installs summed when it was loaded; app writes do not move them, so developer
+    # ranking catches up on the next reload (POST /admin/analytics/reload)
+    stores["app"].upsert(db_app.id, db_app.app_name, db_app.installs or 0)
+
+
+def app_deleted(app_id: int):
+    stores["app"].delete(app_id)
+
+
+def developer_saved(db_developer):
+    stores["developer"].upsert(db_developer.id, db_developer.name)
+
+
+def developer_deleted(developer_id: int):
+    stores["developer"].delete(developer_id)
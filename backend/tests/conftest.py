@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the backend modules import each other by bare name, as uvicorn runs them from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py builds its engines at import time; nothing here connects, so placeholder settings are enough
+for name, value in {"DB_USER": "test", "DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "test"}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,168 @@
+import random
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import column_store
+from analytics import APP_COLUMNS_SCHEMA
+from column_store import AppColumnStore
+
+CONDITIONS = [
+    [],
+    [("rating", ">=", 4.0)],
+    [("rating", "<=", 2.5)],
+    [("rating", ">=", 3.0), ("rating", "<=", 3.0)],
+    [("price", ">=", 0.5), ("price", "<=", 2.0), ("free", "=", False)],
+    [("installs", ">=", 1000)],
+    [("installs", "<=", 100), ("category_id", "=", 2)],
+    [("category_id", "=", 1), ("content_rating", "=", "Teen"), ("editors_choice", "=", True)],
+    [("content_rating", "=", "Adults only 18+")],
+    [("category_id", "=", 999)],
+]
+
+
+def random_row(rng: random.Random, app_id: int) -> dict:
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+
+    return {
+        "id": app_id,
+        "category_id": maybe(rng.randint(1, 4)),
+        "rating": maybe(rng.choice([0.0, 1.5, 2.5, 3.0, 3.0, 4.0, 4.5, 5.0])),
+        "price": maybe(rng.choice([0.0, 0.0, 0.5, 0.99, 2.0, 9.99])),
+        "installs": maybe(rng.choice([0, 10, 100, 1000, 50000, 10 ** 9])),
+        "content_rating": maybe(rng.choice(["Everyone", "Teen", "Mature 17+"])),
+        "free": maybe(rng.random() < 0.8),
+        "ad_supported": maybe(rng.random() < 0.5),
+        "in_app_purchases": maybe(rng.random() < 0.3),
+        "editors_choice": maybe(rng.random() < 0.1),
+        "released": None,
+        "last_updated": None,
+    }
+
+
+def brute_force(rows: dict, conditions: list) -> list:
+    # NULL never matches, like the WHERE clause of filtering.apply_filters
+    def matches(row):
+        for column, operator, value in conditions:
+            cell = row[column]
+            if cell is None or not {">=": cell >= value, "<=": cell <= value, "=": cell == value}[operator]:
+                return False
+        return True
+
+    return sorted(app_id for app_id, row in rows.items() if matches(row))
+
+
+@pytest.fixture
+def rows():
+    rng = random.Random(7)
+    # shuffled ids with gaps, the index has to order them itself
+    ids = rng.sample(range(1, 5000), 1500)
+    return {app_id: random_row(rng, app_id) for app_id in ids}
+
+
+def make_store(rows: dict):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return pa.Table.from_pylist(list(rows.values()), schema=APP_COLUMNS_SCHEMA)
+
+    return AppColumnStore(loader), loads
+
+
+def assert_matches(store, rows):
+    for conditions in CONDITIONS:
+        expected = brute_force(rows, conditions)
+        assert store.matching_ids(conditions).tolist() == expected, conditions
+        assert store.count(conditions) == len(expected), conditions
+
+
+def test_matches_brute_force(rows):
+    store, loads = make_store(rows)
+    assert_matches(store, rows)
+    assert loads == [1]
+
+
+def test_unknown_value_matches_nothing(rows):
+    store, _ = make_store(rows)
+    assert store.count([("content_rating", "=", "Unrated"), ("rating", ">=", 0.0)]) == 0
+    assert store.matching_ids([("category_id", "=", 999)]).dtype == np.int64
+
+
+def test_pages(rows):
+    store, _ = make_store(rows)
+    conditions = [("rating", ">=", 3.0)]
+    expected = brute_force(rows, conditions)
+    assert store.page(conditions, 10, 25) == (expected[10:35], len(expected))
+    assert store.page_after(conditions, expected[9], 25) == expected[10:35]
+    # an id that is not itself a match still resumes after it
+    unmatched = min(app_id for app_id in rows if app_id > expected[9] and app_id not in expected)
+    assert store.page_after(conditions, unmatched, 3) == [app_id for app_id in expected if app_id > unmatched][:3]
+    assert store.page_after(conditions, expected[-1], 10) == []
+
+
+def apply_writes(store, rows: dict, rng: random.Random, count: int):
+    for _ in range(count):
+        if rng.random() < 0.3 and rows:
+            app_id = rng.choice(sorted(rows))
+            del rows[app_id]
+            store.delete(app_id)
+        else:
+            # either replaces an existing app or adds a new one
+            row = random_row(rng, rng.randint(1, 6000))
+            rows[row["id"]] = row
+            store.upsert(row)
+
+
+def test_delta_shadows_the_base_rows(rows, monkeypatch):
+    monkeypatch.setattr(column_store, "APPS_COLUMN_STORE_COMPACT_ROWS", 10 ** 6)
+    store, loads = make_store(rows)
+    store.count([])
+    apply_writes(store, rows, random.Random(11), 300)
+    assert store._delta
+    assert_matches(store, rows)
+    assert loads == [1]
+
+
+def test_compaction_keeps_the_results(rows, monkeypatch):
+    monkeypatch.setattr(column_store, "APPS_COLUMN_STORE_COMPACT_ROWS", 40)
+    store, loads = make_store(rows)
+    store.count([])
+    apply_writes(store, rows, random.Random(13), 300)
+    assert len(store._delta) < 40
+    # compacted rows replace their old versions instead of being appended next to them
+    ids = store._table["id"].to_pylist()
+    assert len(ids) == len(set(ids))
+    assert_matches(store, rows)
+    assert loads == [1]
+
+
+def test_writes_before_the_first_load_are_left_to_the_loader(rows):
+    store, loads = make_store(rows)
+    store.delete(next(iter(rows)))
+    assert loads == [] and store._delta == {}
+    assert_matches(store, rows)
+
+
+def test_clear_category(rows):
+    store, _ = make_store(rows)
+    store.count([])
+    row = dict(random_row(random.Random(3), 9000), category_id=2)
+    rows[row["id"]] = row
+    store.upsert(row)
+    store.clear_category(2)
+    for app_row in rows.values():
+        if app_row["category_id"] == 2:
+            app_row["category_id"] = None
+    assert store.count([("category_id", "=", 2)]) == 0
+    assert_matches(store, rows)
+
+
+def test_reload_reads_the_loader_again(rows):
+    store, loads = make_store(rows)
+    store.count([])
+    store.reload()
+    assert_matches(store, rows)
+    assert loads == [1, 1]
@@ -0,0 +1,117 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from entities import App, Developer
+from pagination import APP_SORT_COLUMNS, encode_cursor, decode_cursor, keyset_segments, fetch_keyset_rows, \
+    resolve_sort_column, split_keyset_page
+
+
+def sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(4.5, 17)) == (4.5, 17)
+    assert decode_cursor(encode_cursor(None, 3)) == (None, 3)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor(1, 2)[:-3], "W10"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_sort_columns_are_the_indexed_ones():
+    assert resolve_sort_column(App, "rating", APP_SORT_COLUMNS) is App.rating
+    with pytest.raises(HTTPException) as error:
+        resolve_sort_column(App, "app_name", APP_SORT_COLUMNS)
+    assert error.value.status_code == 400
+
+
+def test_id_order_is_a_single_segment():
+    [segment] = keyset_segments(select(App.id), App.id, App.id, encode_cursor(10, 10))
+    assert "WHERE apps.id > 10 ORDER BY apps.id" in sql(segment)
+
+
+def test_first_page_reads_values_then_nulls():
+    values, nulls = keyset_segments(select(App.id), App.rating, App.id, "")
+    assert "WHERE apps.rating IS NOT NULL ORDER BY apps.rating, apps.id" in sql(values)
+    assert "WHERE apps.rating IS NULL ORDER BY apps.id" in sql(nulls)
+
+
+def test_value_cursor_uses_only_the_row_comparison():
+    values, nulls = keyset_segments(select(App.id), App.rating, App.id, encode_cursor(4.5, 17))
+    compiled = sql(values)
+    assert "(apps.rating, apps.id) > (4.5, 17)" in compiled
+    assert " OR " not in compiled
+    assert "ORDER BY apps.rating, apps.id" in compiled
+    assert "WHERE apps.rating IS NULL ORDER BY apps.id" in sql(nulls)
+
+
+def test_null_cursor_stays_in_the_null_segment():
+    [nulls] = keyset_segments(select(App.id), App.rating, App.id, encode_cursor(None, 17))
+    assert "WHERE apps.rating IS NULL AND apps.id > 17 ORDER BY apps.id" in sql(nulls)
+
+
+def test_integer_cursor_on_a_float_column_is_coerced():
+    values, _ = keyset_segments(select(App.id), App.rating, App.id, encode_cursor(4, 17))
+    assert "(apps.rating, apps.id) > (4.0, 17)" in sql(values)
+
+
+@pytest.mark.parametrize("column, value", [(App.rating, "high"), (App.installs, 1.5), (App.installs, True),
+                                           (App.rating, [1])])
+def test_cursor_of_the_wrong_type_is_rejected(column, value):
+    with pytest.raises(HTTPException) as error:
+        keyset_segments(select(App.id), column, App.id, encode_cursor(value, 17))
+    assert error.value.status_code == 400
+
+
+def test_developer_keyset_is_by_id():
+    [segment] = keyset_segments(select(Developer), Developer.id, Developer.id, "")
+    assert "ORDER BY developers.id" in sql(segment)
+
+
+def segment_rows(rows_by_segment: dict):
+    # stands in for the database: each segment returns its rows up to the LIMIT it was given
+    calls = []
+
+    def run(statement):
+        limit = statement._limit
+        calls.append(limit)
+        return rows_by_segment[len(calls) - 1][:limit]
+
+    return run, calls
+
+
+def test_full_page_does_not_read_the_null_segment():
+    run, calls = segment_rows({0: list(range(20)), 1: ["null"]})
+    rows = fetch_keyset_rows(run, keyset_segments(select(App.id), App.rating, App.id, ""), 10)
+    assert rows == list(range(11))
+    assert calls == [11]
+
+
+def test_short_value_segment_is_topped_up_from_the_nulls():
+    run, calls = segment_rows({0: [1, 2, 3], 1: ["a", "b", "c", "d", "e"]})
+    rows = fetch_keyset_rows(run, keyset_segments(select(App.id), App.rating, App.id, ""), 5)
+    assert rows == [1, 2, 3, "a", "b", "c"]
+    assert calls == [6, 3]
+
+
+class Row:
+    def __init__(self, id, rating):
+        self.id = id
+        self.rating = rating
+
+
+def test_split_keyset_page_encodes_the_last_row():
+    rows, cursor = split_keyset_page([Row(1, 4.0), Row(2, None), Row(3, None)], 2, "rating")
+    assert [row.id for row in rows] == [1, 2]
+    assert decode_cursor(cursor) == (None, 2)
+
+
+def test_last_page_has_no_cursor():
+    rows = [Row(1, 4.0)]
+    assert split_keyset_page(rows, 2, "rating") == (rows, None)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+
+import rollups
+from rollups import merge_counts, rating_bucket
+
+
+@pytest.mark.parametrize("rating, bucket", [(4.25, "4.3"), (4.35, "4.4"), (0.05, "0.1"), (2.44, "2.4"),
+                                            (5.0, "5.0"), (1, "1.0")])
+def test_rating_bucket_rounds_half_up_like_postgres(rating, bucket):
+    # ROUND(rating::numeric, 1) rounds the decimal value half up; round(4.25, 1) would give 4.2
+    assert rating_bucket(rating) == Decimal(bucket)
+
+
+def test_merge_counts_sums_categories_and_drops_zeros():
+    per_category = {1: {2020: 3, 2021: 1}, 2: {2020: -3, 2022: 4}}
+    assert merge_counts(per_category) == {2021: 1, 2022: 4}
+    assert merge_counts(per_category, 2) == {2020: -3, 2022: 4}
+    assert merge_counts(per_category, 9) == {}
+
+
+class RecordingSession:
+    def __init__(self):
+        self.info = {}
+        self.executed = []
+
+    def execute(self, statement, params):
+        self.executed.append((statement, params))
+
+
+def snapshot(category_id, released_year, updated_year, rating):
+    return {"category_id": category_id, "released_year": released_year, "updated_year": updated_year,
+            "rating": rating}
+
+
+def test_batch_deltas_are_netted_per_rollup_row(monkeypatch):
+    monkeypatch.setattr(rollups, "STATISTICS_ROLLUP", True)
+    db = RecordingSession()
+    removed = [snapshot(1, 2020, 2021, 4.25), snapshot(1, 2019, 2021, None)]
+    added = [snapshot(1, 2020, 2022, 4.3), snapshot(2, None, None, 3.0)]
+    rollups.apply_app_deltas(db, removed, added)
+
+    executed = {statement: params for statement, params in db.executed}
+    assert executed[rollups.UPSERT_RELEASE] == [{"category_id": 1, "year": 2019, "delta": -1}]
+    assert sorted(executed[rollups.UPSERT_UPDATE], key=lambda row: row["year"]) == [
+        {"category_id": 1, "year": 2021, "delta": -2}, {"category_id": 1, "year": 2022, "delta": 1}]
+    # 4.25 and 4.3 share the 4.3 bucket, so it is left alone
+    assert executed[rollups.UPSERT_RATING] == [{"category_id": 2, "bucket": Decimal("3.0"), "delta": 1}]
+    average = {row["category_id"]: row for row in executed[rollups.UPSERT_AVERAGE]}
+    assert average[1]["delta"] == 0 and average[1]["rating"] == pytest.approx(0.05)
+    assert average[2] == {"category_id": 2, "rating": 3.0, "delta": 1}
+    assert db.info["rollups_changed"] is True
+
+
+def test_deltas_are_skipped_without_rollups(monkeypatch):
+    monkeypatch.setattr(rollups, "STATISTICS_ROLLUP", False)
+    db = RecordingSession()
+    rollups.apply_app_deltas(db, [snapshot(1, 2020, 2020, 4.0)], [])
+    assert db.executed == [] and db.info == {}
+
+
+def test_rollback_forgets_the_change():
+    db = RecordingSession()
+    rollups.mark_changed(db)
+    rollups.forget_changes(db)
+    assert "rollups_changed" not in db.info
@@ -0,0 +1,44 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from entities import App
+from search import SEARCH_MAX_CANDIDATES, escape_like, search_statements
+
+
+def sql(statement) -> str:
+    # asyncpg's numeric paramstyle leaves the % of literals undoubled
+    return str(statement.compile(dialect=asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_escape_like():
+    assert escape_like("100%_a\\b") == "100\\%\\_a\\\\b"
+
+
+def test_candidates_are_ranked_before_the_cap():
+    page, _ = search_statements(select(App), "chess", 20, 10)
+    compiled = sql(page)
+    inner = compiled[compiled.index("FROM (") + len("FROM ("):compiled.rindex(") AS anon_1")]
+    assert inner.index("ORDER BY") < inner.index(f"LIMIT {SEARCH_MAX_CANDIDATES}")
+    assert "word_similarity('chess', apps.app_name) DESC" in inner
+    assert "(apps.app_name %> 'chess')" in inner
+    # the page ranks the capped candidates again, then offsets into them
+    outer = compiled[compiled.rindex(") AS anon_1"):]
+    assert "ORDER BY" in outer and "word_similarity('chess', anon_1.app_name) DESC" in outer
+    assert outer.endswith("LIMIT 10 OFFSET 20")
+
+
+def test_count_is_capped_without_ranking():
+    _, count = search_statements(select(App).where(App.free.is_(True)), "chess", 0, 10)
+    compiled = sql(count)
+    assert compiled.startswith("SELECT count(*) AS count_1")
+    assert f"LIMIT {SEARCH_MAX_CANDIDATES}" in compiled
+    assert "ORDER BY" not in compiled
+    assert "word_similarity" not in compiled
+    assert "apps.free IS true" in compiled
+
+
+def test_query_wildcards_are_escaped():
+    page, _ = search_statements(select(App), "50%", 0, 10)
+    compiled = sql(page)
+    assert "apps.app_name ILIKE '%50\\%%' ESCAPE '\\'" in compiled
+    assert "lower(apps.app_name) LIKE '50\\%%' ESCAPE '\\'" in compiled
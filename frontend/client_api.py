@@ -1,29 +1,77 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
 
 api_url = "http://127.0.0.1:8000"
 
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "30"))
+
+# one keep-alive connection pool per process instead of a new connection per call
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE))
+
+executor = ThreadPoolExecutor(max_workers=API_POOL_SIZE, thread_name_prefix="client_api")
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def cached_get(endpoint, params):
+    # shared by every browser session of this Streamlit process; a failed call raises so it is not cached
+    response = session.get(f"{api_url}/{endpoint}", params=dict(params), timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def cache_params(params):
+    # None values are not sent, and the order of the rest does not matter, so neither is part of the key
+    return tuple(sorted((key, value) for key, value in (params or {}).items() if value is not None))
+
 
 def fetch_data(endpoint, params=None):
     try:
-        response = requests.get(f"{api_url}/{endpoint}", params=params)
-        return response.json() if response.status_code == 200 else None
+        return cached_get(endpoint, cache_params(params))
     except requests.RequestException as e:
         print(f"Error fetching data from {endpoint}: {e}")
         return None
 
 
+def fetch_many(calls):
+    # runs the GETs a page needs side by side; calls is a list of (function, *args) and the results come back
+    # in the same order
+    futures = [executor.submit(function, *args) for function, *args in calls]
+    return [future.result() for future in futures]
+
+
 def post_data(endpoint, data):
     try:
-        response = requests.post(f"{api_url}/{endpoint}", json=data)
+        response = session.post(f"{api_url}/{endpoint}", json=data, timeout=API_TIMEOUT)
+        cached_get.clear()
         return response.json() if response.status_code == 200 else None
     except requests.RequestException as e:
         print(f"Error posting data to {endpoint}: {e}")
         return None
 
 
+def query_data(endpoint, data):
+    # a read POSTed only because it has a body, so unlike post_data it leaves the GET cache alone
+    try:
+        response = session.post(f"{api_url}/{endpoint}", json=data, timeout=API_TIMEOUT)
+        return response.json() if response.status_code == 200 else None
+    except requests.RequestException as e:
+        print(f"Error querying data from {endpoint}: {e}")
+        return None
+
+
 def put_data(endpoint, data):
     try:
-        response = requests.put(f"{api_url}/{endpoint}", json=data)
+        response = session.put(f"{api_url}/{endpoint}", json=data, timeout=API_TIMEOUT)
+        cached_get.clear()
         return response.json() if response.status_code == 200 else None
     except requests.RequestException as e:
         print(f"Error updating data at {endpoint}: {e}")
@@ -32,7 +80,8 @@ def put_data(endpoint, data):
 
 def delete_data(endpoint):
     try:
-        response = requests.delete(f"{api_url}/{endpoint}")
+        response = session.delete(f"{api_url}/{endpoint}", timeout=API_TIMEOUT)
+        cached_get.clear()
         return response.status_code == 200
     except requests.RequestException as e:
         print(f"Error deleting data at {endpoint}: {e}")
@@ -75,6 +124,32 @@ def fetch_apps(filters=None):
     return fetch_data("apps", filters)
 
 
+def stream_apps(filters=None, fields=None):
+    # every matching app from one streamed /apps/export request instead of paging through /apps
+    params = {**(filters or {}), "format": "ndjson"}
+    if fields:
+        params["fields"] = ",".join(fields)
+    try:
+        with session.get(f"{api_url}/apps/export", params=params, stream=True, timeout=API_TIMEOUT) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except requests.RequestException as e:
+        print(f"Error exporting apps: {e}")
+
+
+def search_apps(query, filters=None):
+    return fetch_data("apps/search", {**(filters or {}), "q": query})
+
+
+def fetch_suggestions(query, kind=None, limit=10):
+    params = {"q": query, "limit": limit}
+    if kind:
+        params["kind"] = kind
+    return fetch_data("suggest", params) or []
+
+
 def create_app(app_id, app_name, category_id, developer_id, rating, free):
     return post_data("apps", {
         "app_id": app_id, "app_name": app_name,
@@ -96,11 +171,22 @@ def fetch_filters():
     return filters_data if filters_data else {}
 
 
+def fetch_statistics(statistics):
+    # several statistics in one request, e.g. [{"statistic": "release_trend", "filters": {"category": "Games"}}]
+    data = query_data("statistics/batch", statistics)
+    return [entry["result"] for entry in data] if data is not None else None
+
+
 def fetch_rating_distribution(filters):
     data = fetch_data("statistics/rating_distribution", filters)
     return data if data else []
 
 
+def fetch_histogram(column, filters=None, buckets=None, width=None):
+    params = {**(filters or {}), "column": column, "buckets": buckets, "width": width}
+    return fetch_data("statistics/histogram", params)
+
+
 def fetch_release_trend(category=None):
     params = {"category_name": category} if category else {}
     return fetch_data("statistics/release_trend", params)
@@ -1,7 +1,7 @@
 import pandas as pd
 import streamlit as st
 
-from client_api import fetch_apps
+from client_api import fetch_apps, search_apps, fetch_suggestions, fetch_many
 from filters import get_filters
 
 st.subheader("Search Apps")
@@ -19,6 +19,9 @@ with st.sidebar:
         show_editors_choice=True
     )
 
+query = st.text_input("🔎 Search by app name or package id", help="At least 3 characters, typos are tolerated")
+suggestions_placeholder = st.empty()
+
 col1, col2 = st.columns(2)
 with col1:
     page = st.number_input("Page", min_value=1, step=1, value=1)
@@ -28,16 +31,25 @@ with col2:
 filters["page"] = page
 filters["per_page"] = per_page
 
-response = fetch_apps(filters)
+# the suggestions and the result page are fetched at the same time
+results_call = (search_apps, query.strip(), filters) if len(query.strip()) >= 3 else (fetch_apps, filters)
+if query.strip():
+    suggestions, response = fetch_many([(fetch_suggestions, query, "app", 5), results_call])
+    if suggestions:
+        suggestions_placeholder.caption("Suggestions: " + " · ".join(suggestion["name"] for suggestion in suggestions))
+else:
+    function, *args = results_call
+    response = function(*args)
 
-if response["apps"]:
+if response and response["apps"]:
     apps = pd.DataFrame(response["apps"])
     total_apps = response["total_apps"]
     total_pages = response["total_pages"]
 
     st.dataframe(apps)
 
-    st.write(f"Showing page {page} of {total_pages} (Total results: {total_apps})")
+    about = "about " if response.get("approximate") else ""
+    st.write(f"Showing page {page} of {total_pages} (Total results: {about}{total_apps})")
 
 else:
     st.warning("No apps found with the current filters.")
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import APP_COLUMNS, APP_OUTPUT_COLUMNS, clean
+from parallel import clean_parallel
+
+
+def clean_like_notebook(raw_path: str, out_dir: str):
+    # the cleaning and saving cells of notebooks/data_cleaning.ipynb, minus the plots
+    df = pd.read_csv(raw_path)
+    df.drop(columns=["Developer Website", "Privacy Policy"], inplace=True)
+    df.dropna(subset=["App Name", "Developer Id", "Developer Email", "Installs", "Minimum Installs", "Size"],
+              inplace=True)
+    df["Installs"] = df["Installs"].str.replace("+", "", regex=False).str.replace(",", "", regex=False) \
+        .astype(np.int64)
+    df["Minimum Installs"] = df["Minimum Installs"].astype(np.int64)
+    df["Released"] = pd.to_datetime(df["Released"], errors="coerce").fillna(pd.Timestamp("2000-01-01"))
+    df["Last Updated"] = pd.to_datetime(df["Last Updated"], errors="coerce")
+    df["Scraped Time"] = pd.to_datetime(df["Scraped Time"], errors="coerce")
+    df["Rating"] = df["Rating"].fillna(0.0)
+    df["Rating Count"] = df["Rating Count"].fillna(0).astype(np.int64)
+    df[["Minimum Android"]] = df[["Minimum Android"]].fillna("Unknown")
+    df["Size"] = df["Size"].str.replace("M", "000000").str.replace("k", "000").str.replace("G", "000000000")
+    df["Size"] = pd.to_numeric(df["Size"], errors="coerce")
+    df["Size"] = df["Size"].fillna(df["Size"].mean())
+    df["Size"] = df["Size"].apply(lambda x: x / 1000000)
+    df["App Name"] = df["App Name"].apply(lambda x: x.replace("'", "''"))
+    df["Developer Id"] = df["Developer Id"].apply(lambda x: x.replace("'", "''"))
+
+    categories = df["Category"].dropna().unique()
+    pd.DataFrame({"id": range(1, len(categories) + 1), "name": categories}) \
+        .to_csv(os.path.join(out_dir, "cleaned_categories.csv"), index=False)
+
+    developers_df = df[["Developer Id", "Developer Email"]].dropna().drop_duplicates(subset=["Developer Id"])
+    developers_df = developers_df.rename(columns={"Developer Id": "name", "Developer Email": "email"})
+    developers_df["id"] = range(1, len(developers_df) + 1)
+    developers_df[["id", "name", "email"]].to_csv(os.path.join(out_dir, "cleaned_developers.csv"), index=False)
+
+    category_map = {category: idx + 1 for idx, category in enumerate(categories)}
+    developer_map = {name: idx + 1 for idx, name in enumerate(developers_df["name"])}
+    df["category_id"] = df["Category"].map(category_map)
+    df["developer_id"] = df["Developer Id"].map(developer_map)
+    df["id"] = range(1, len(df) + 1)
+    apps_df = df.rename(columns=APP_COLUMNS)[APP_OUTPUT_COLUMNS]
+    apps_df.to_csv(os.path.join(out_dir, "cleaned_apps.csv"), index=False)
+
+
+def run_single(mode: str, raw_path: str, chunk_rows: int, workers: int):
+    with tempfile.TemporaryDirectory() as out_dir:
+        start_time = time.perf_counter()
+        if mode == "notebook":
+            clean_like_notebook(raw_path, out_dir)
+        elif mode == "parallel":
+            clean_parallel(raw_path, out_dir, workers, chunk_rows)
+        else:
+            clean(raw_path, out_dir, chunk_rows)
+        elapsed = time.perf_counter() - start_time
+    # worker processes count towards RUSAGE_CHILDREN, so report the larger of the two
+    peak_rss_mb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+    print(json.dumps({"mode": mode, "seconds": elapsed, "peak_rss_mb": peak_rss_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the notebook cleaning with the streaming pipeline")
+    parser.add_argument("--raw", default=os.path.join("..", "data", "Google-Playstore.csv"))
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--modes", nargs="+", default=["notebook", "streaming", "parallel"])
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single, args.raw, args.chunk_rows, args.workers)
+        return
+
+    # every mode runs in its own process so peak RSS is not shared between runs
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", mode, "--raw", args.raw,
+             "--chunk-rows", str(args.chunk_rows), "--workers", str(args.workers)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['mode']:>12}: {result['seconds']:8.2f} s, peak RSS {result['peak_rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+RAW_DTYPES = {
+    "App Name": "string",
+    "App Id": "string",
+    "Category": "string",
+    "Rating": "float64",
+    "Rating Count": "float64",
+    "Installs": "string",
+    "Minimum Installs": "float64",
+    "Maximum Installs": "float64",
+    "Free": "boolean",
+    "Price": "float64",
+    "Currency": "string",
+    "Size": "string",
+    "Minimum Android": "string",
+    "Developer Id": "string",
+    "Developer Email": "string",
+    "Released": "string",
+    "Last Updated": "string",
+    "Content Rating": "string",
+    "Ad Supported": "boolean",
+    "In App Purchases": "boolean",
+    "Editors Choice": "boolean",
+    "Scraped Time": "string",
+}
+
+CRUCIAL_COLUMNS = ["App Name", "Developer Id", "Developer Email", "Installs", "Minimum Installs", "Size"]
+
+APP_COLUMNS = {
+    "App Name": "app_name",
+    "App Id": "app_id",
+    "Rating": "rating",
+    "Rating Count": "rating_count",
+    "Installs": "installs",
+    "Minimum Installs": "min_installs",
+    "Maximum Installs": "max_installs",
+    "Free": "free",
+    "Price": "price",
+    "Currency": "currency",
+    "Size": "size",
+    "Minimum Android": "min_android",
+    "Released": "released",
+    "Last Updated": "last_updated",
+    "Content Rating": "content_rating",
+    "Ad Supported": "ad_supported",
+    "In App Purchases": "in_app_purchases",
+    "Editors Choice": "editors_choice",
+    "Scraped Time": "scraped_time",
+}
+
+APP_OUTPUT_COLUMNS = [
+    "id", "app_id", "app_name", "category_id", "developer_id", "rating", "rating_count",
+    "installs", "min_installs", "max_installs", "free", "price", "currency",
+    "size", "min_android", "released", "last_updated", "content_rating",
+    "ad_supported", "in_app_purchases", "editors_choice", "scraped_time"
+]
+
+# sizes are parsed to whole bytes, so the global mean is an exact integer sum, and stored in MB
+SIZE_UNITS_BYTES = {"": 1.0, "k": 1e3, "M": 1e6, "G": 1e9}
+DATE_FORMAT = "%b %d, %Y"
+SCRAPED_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_RELEASED = pd.Timestamp("2000-01-01")
+
+
+def read_raw_chunks(raw_path: str, chunk_rows: int, usecols=None):
+    columns = usecols or list(RAW_DTYPES)
+    return pd.read_csv(
+        raw_path,
+        usecols=columns,
+        dtype={column: RAW_DTYPES[column] for column in columns},
+        chunksize=chunk_rows,
+    )
+
+
+def parse_size_bytes(size: pd.Series) -> pd.Series:
+    parts = size.str.extract(r"^\s*([\d.,]+)\s*([kMG]?)\s*$")
+    value = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce").astype("float64")
+    scale = parts[1].map(SIZE_UNITS_BYTES).astype("float64")
+    return np.rint(value * scale)
+
+
+def parse_installs(installs: pd.Series) -> pd.Series:
+    digits = installs.str.replace("+", "", regex=False).str.replace(",", "", regex=False)
+    return pd.to_numeric(digits, errors="coerce").astype("int64")
+
+
+def size_totals(chunks) -> tuple:
+    total_bytes = 0
+    count = 0
+    for chunk in chunks:
+        sizes = parse_size_bytes(chunk.dropna(subset=CRUCIAL_COLUMNS)["Size"]).dropna()
+        total_bytes += int(sizes.astype("int64").sum())
+        count += len(sizes)
+    return total_bytes, count
+
+
+def size_mean_mb(total_bytes: int, count: int) -> float:
+    return total_bytes / count / 1e6 if count else 0.0
+
+
+def compute_size_mean(raw_path: str, chunk_rows: int) -> float:
+    return size_mean_mb(*size_totals(read_raw_chunks(raw_path, chunk_rows, usecols=CRUCIAL_COLUMNS)))
+
+
+def clean_chunk(chunk: pd.DataFrame, size_mean: float, escape_quotes: bool = False) -> pd.DataFrame:
+    df = chunk.dropna(subset=CRUCIAL_COLUMNS).copy()
+
+    df["Installs"] = parse_installs(df["Installs"])
+    df["Minimum Installs"] = df["Minimum Installs"].astype("int64")
+    df["Maximum Installs"] = df["Maximum Installs"].astype("Int64")
+
+    df["Released"] = pd.to_datetime(df["Released"], format=DATE_FORMAT, errors="coerce").fillna(DEFAULT_RELEASED)
+    df["Last Updated"] = pd.to_datetime(df["Last Updated"], format=DATE_FORMAT, errors="coerce")
+    df["Scraped Time"] = pd.to_datetime(df["Scraped Time"], format=SCRAPED_TIME_FORMAT, errors="coerce")
+
+    df["Rating"] = df["Rating"].fillna(0.0)
+    df["Rating Count"] = df["Rating Count"].fillna(0).astype("int64")
+    df["Minimum Android"] = df["Minimum Android"].fillna("Unknown")
+    df["Size"] = (parse_size_bytes(df["Size"]) / 1e6).fillna(size_mean)
+
+    if escape_quotes:
+        df["App Name"] = df["App Name"].str.replace("'", "''", regex=False)
+        df["Developer Id"] = df["Developer Id"].str.replace("'", "''", regex=False)
+
+    return df
+
+
+class IdAssigner:
+    def __init__(self):
+        self.categories = {}
+        self.developers = {}
+
+    @staticmethod
+    def _extend(mapping: dict, uniques) -> list:
+        new_keys = [key for key in uniques if key not in mapping]
+        start = len(mapping) + 1
+        mapping.update(zip(new_keys, range(start, start + len(new_keys))))
+        return new_keys
+
+    @staticmethod
+    def _lookup(mapping: dict, values: pd.Series, uniques, codes: np.ndarray) -> pd.Series:
+        ids = np.array([mapping[key] for key in uniques] + [0], dtype="int64")
+        result = pd.Series(ids[codes], index=values.index, dtype="Int64")
+        return result.mask(codes == -1)
+
+    def assign_categories(self, categories: pd.Series):
+        codes, uniques = pd.factorize(categories)
+        new_categories = self._extend(self.categories, uniques)
+        new_rows = pd.DataFrame({
+            "id": [self.categories[name] for name in new_categories],
+            "name": new_categories,
+        })
+        return self._lookup(self.categories, categories, uniques, codes), new_rows
+
+    def assign_developers(self, developer_ids: pd.Series, emails: pd.Series):
+        codes, uniques = pd.factorize(developer_ids)
+        is_new = np.array([key not in self.developers for key in uniques], dtype=bool)
+        new_developers = self._extend(self.developers, uniques)
+        # factorize keeps first-appearance order, so the first rows line up with uniques and supply
+        # each new developer's email, as drop_duplicates did in the notebook
+        first_emails = emails[~developer_ids.duplicated()].to_numpy()
+        new_rows = pd.DataFrame({
+            "id": [self.developers[name] for name in new_developers],
+            "name": new_developers,
+            "email": first_emails[is_new],
+        })
+        return self._lookup(self.developers, developer_ids, uniques, codes), new_rows
+
+
+def to_app_frame(df: pd.DataFrame, ids: IdAssigner, first_id: int):
+    category_ids, new_categories = ids.assign_categories(df["Category"])
+    developer_ids, new_developers = ids.assign_developers(df["Developer Id"], df["Developer Email"])
+
+    apps = df.rename(columns=APP_COLUMNS)
+    apps["category_id"] = category_ids
+    apps["developer_id"] = developer_ids
+    apps["id"] = np.arange(first_id, first_id + len(apps), dtype="int64")
+    apps["released"] = format_dates(apps["released"])
+    apps["last_updated"] = format_dates(apps["last_updated"])
+    return apps[APP_OUTPUT_COLUMNS], new_categories, new_developers
+
+
+def format_dates(dates: pd.Series) -> np.ndarray:
+    # explicit formatting keeps the text independent of how rows are split into chunks
+    values = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    return np.where(np.isnat(values), "", np.datetime_as_string(values))
+
+
+def output_paths(out_dir: str) -> dict:
+    return {
+        "categories": os.path.join(out_dir, "cleaned_categories.csv"),
+        "developers": os.path.join(out_dir, "cleaned_developers.csv"),
+        "apps": os.path.join(out_dir, "cleaned_apps.csv"),
+    }
+
+
+def append_csv(frame: pd.DataFrame, path: str, first: bool):
+    frame.to_csv(path, mode="w" if first else "a", header=first, index=False, date_format=SCRAPED_TIME_FORMAT)
+
+
+def open_parquet_writer(out_dir: str, basename: str = "part-0.parquet"):
+    from parquet_output import PartitionedParquetWriter, parquet_dir
+    return PartitionedParquetWriter(parquet_dir(out_dir), basename)
+
+
+def clean(raw_path: str, out_dir: str, chunk_rows: int = 100000, escape_quotes: bool = False,
+          parquet: bool = False) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = output_paths(out_dir)
+    size_mean = compute_size_mean(raw_path, chunk_rows)
+    if parquet:
+        from parquet_output import reset_parquet_dir
+        reset_parquet_dir(out_dir)
+        parquet_writer = open_parquet_writer(out_dir)
+
+    ids = IdAssigner()
+    apps_written = 0
+    first = True
+    for chunk in read_raw_chunks(raw_path, chunk_rows):
+        df = clean_chunk(chunk, size_mean, escape_quotes)
+        apps, new_categories, new_developers = to_app_frame(df, ids, apps_written + 1)
+        append_csv(new_categories, paths["categories"], first)
+        append_csv(new_developers, paths["developers"], first)
+        append_csv(apps, paths["apps"], first)
+        if parquet:
+            parquet_writer.write(apps)
+        apps_written += len(apps)
+        first = False
+
+    if parquet:
+        parquet_writer.close()
+    return {"apps": apps_written, "categories": len(ids.categories), "developers": len(ids.developers)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the raw Google Play Store dump in bounded memory")
+    parser.add_argument("--raw", default=os.path.join("..", "data", "Google-Playstore.csv"))
+    parser.add_argument("--out-dir", default=os.path.join("..", "data"))
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    parser.add_argument("--escape-quotes", action="store_true",
+                        help="double single quotes in app and developer names like the notebook did")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="split the raw file into this many shards and clean them in parallel processes")
+    parser.add_argument("--parquet", action="store_true",
+                        help="also write the apps as Parquet partitioned by category_id")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.workers > 1:
+        from parallel import clean_parallel
+        summary = clean_parallel(args.raw, args.out_dir, args.workers, args.chunk_rows, args.escape_quotes,
+                                 args.parquet)
+    else:
+        summary = clean(args.raw, args.out_dir, args.chunk_rows, args.escape_quotes, args.parquet)
+    print(f"Saved {summary['categories']} categories, {summary['developers']} developers and "
+          f"{summary['apps']} apps to '{args.out_dir}' in {time.time() - start_time:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import csv
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cleaning import RAW_DTYPES, CRUCIAL_COLUMNS, APP_OUTPUT_COLUMNS, IdAssigner, clean_chunk, to_app_frame, \
+    output_paths, append_csv, size_totals, size_mean_mb, open_parquet_writer
+
+SCAN_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+class ByteRangeReader:
+    def __init__(self, path: str, start: int, end: int):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def read_header(raw_path: str):
+    with open(raw_path, "rb") as f:
+        header = f.readline()
+        return next(csv.reader([header.decode()])), f.tell()
+
+
+def find_shard_ranges(raw_path: str, shards: int) -> list:
+    # a newline ends a record only when the quotes seen since the header are balanced
+    _, data_start = read_header(raw_path)
+    size = os.path.getsize(raw_path)
+    targets = [data_start + (size - data_start) * index // shards for index in range(1, shards)]
+
+    boundaries = [data_start]
+    parity = 0
+    position = data_start
+    with open(raw_path, "rb") as f:
+        f.seek(data_start)
+        for target in targets:
+            if target <= position:
+                continue
+            while position < target:
+                block = f.read(min(SCAN_BLOCK_BYTES, target - position))
+                parity ^= block.count(b'"') & 1
+                position += len(block)
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                parity ^= line.count(b'"') & 1
+                position += len(line)
+                if parity == 0:
+                    break
+            if position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def read_shard_chunks(raw_path: str, start: int, end: int, chunk_rows: int, usecols=None):
+    names, _ = read_header(raw_path)
+    columns = usecols or list(RAW_DTYPES)
+    reader = ByteRangeReader(raw_path, start, end)
+    try:
+        yield from pd.read_csv(
+            reader,
+            header=None,
+            names=names,
+            usecols=columns,
+            dtype={column: RAW_DTYPES[column] for column in columns},
+            chunksize=chunk_rows,
+        )
+    finally:
+        reader.close()
+
+
+def shard_size_totals(task) -> tuple:
+    raw_path, start, end, chunk_rows = task
+    return size_totals(read_shard_chunks(raw_path, start, end, chunk_rows, usecols=CRUCIAL_COLUMNS))
+
+
+def clean_shard(task) -> dict:
+    # shard-local ids follow first appearance inside the shard and are remapped once all shards are known
+    raw_path, start, end, chunk_rows, size_mean, escape_quotes, work_path = task
+    ids = IdAssigner()
+    categories = []
+    developers = []
+    rows = 0
+    for chunk in read_shard_chunks(raw_path, start, end, chunk_rows):
+        df = clean_chunk(chunk, size_mean, escape_quotes)
+        apps, new_categories, new_developers = to_app_frame(df, ids, rows + 1)
+        append_csv(apps, work_path, rows == 0)
+        categories.extend(new_categories["name"])
+        developers.extend(zip(new_developers["name"], new_developers["email"]))
+        rows += len(apps)
+    return {"rows": rows, "categories": categories, "developers": developers}
+
+
+def finalize_shard(task):
+    work_path, final_path, first_id, category_ids, developer_ids, chunk_rows, parquet_out_dir, index = task
+    open(final_path, "wb").close()
+    if not os.path.exists(work_path):
+        return
+    parquet_writer = open_parquet_writer(parquet_out_dir, f"part-{index}.parquet") if parquet_out_dir else None
+    next_id = first_id
+    for frame in pd.read_csv(work_path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        frame["id"] = np.arange(next_id, next_id + len(frame)).astype(str)
+        frame["category_id"] = category_ids[local_ids(frame["category_id"])]
+        frame["developer_id"] = developer_ids[local_ids(frame["developer_id"])]
+        frame[APP_OUTPUT_COLUMNS].to_csv(final_path, mode="a", header=False, index=False)
+        if parquet_writer:
+            parquet_writer.write(frame)
+        next_id += len(frame)
+    if parquet_writer:
+        parquet_writer.close()
+
+
+def local_ids(values: pd.Series) -> np.ndarray:
+    return pd.to_numeric(values.replace("", "0")).to_numpy(dtype="int64")
+
+
+def merge_ids(mapping: dict, names) -> np.ndarray:
+    # index 0 maps the missing id, so it stays empty in the output
+    translation = [""]
+    for name in names:
+        if name not in mapping:
+            mapping[name] = len(mapping) + 1
+        translation.append(str(mapping[name]))
+    return np.array(translation, dtype=object)
+
+
+def clean_parallel(raw_path: str, out_dir: str, workers: int, chunk_rows: int = 100000,
+                   escape_quotes: bool = False, parquet: bool = False) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = output_paths(out_dir)
+    if parquet:
+        from parquet_output import reset_parquet_dir
+        reset_parquet_dir(out_dir)
+    ranges = find_shard_ranges(raw_path, workers)
+    work_dir = tempfile.mkdtemp(dir=out_dir)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            totals = list(executor.map(shard_size_totals, [(raw_path, start, end, chunk_rows)
+                                                           for start, end in ranges]))
+            size_mean = size_mean_mb(sum(total for total, _ in totals), sum(count for _, count in totals))
+
+            work_paths = [os.path.join(work_dir, f"shard_{index}.csv") for index in range(len(ranges))]
+            shards = list(executor.map(clean_shard, [
+                (raw_path, start, end, chunk_rows, size_mean, escape_quotes, work_path)
+                for (start, end), work_path in zip(ranges, work_paths)
+            ]))
+
+            ids = IdAssigner()
+            new_developers = []
+            finalize_tasks = []
+            first_id = 1
+            for index, shard in enumerate(shards):
+                category_ids = merge_ids(ids.categories, shard["categories"])
+                known = len(ids.developers)
+                developer_ids = merge_ids(ids.developers, [name for name, _ in shard["developers"]])
+                new_developers.extend(
+                    (int(developer_id), name, email)
+                    for developer_id, (name, email) in zip(developer_ids[1:], shard["developers"])
+                    if int(developer_id) > known
+                )
+                final_path = os.path.join(work_dir, f"final_{index}.csv")
+                finalize_tasks.append((work_paths[index], final_path, first_id, category_ids, developer_ids,
+                                       chunk_rows, out_dir if parquet else None, index))
+                first_id += shard["rows"]
+
+            list(executor.map(finalize_shard, finalize_tasks))
+
+        pd.DataFrame({"id": list(ids.categories.values()), "name": list(ids.categories)}) \
+            .to_csv(paths["categories"], index=False)
+        pd.DataFrame(new_developers, columns=["id", "name", "email"]).to_csv(paths["developers"], index=False)
+        with open(paths["apps"], "wb") as apps_file:
+            apps_file.write((",".join(APP_OUTPUT_COLUMNS) + "\n").encode())
+            for _, final_path, *_ in finalize_tasks:
+                with open(final_path, "rb") as shard_file:
+                    shutil.copyfileobj(shard_file, apps_file)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"apps": first_id - 1, "categories": len(ids.categories), "developers": len(ids.developers)}
@@ -0,0 +1,111 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+PARQUET_DIR_NAME = "cleaned_apps_parquet"
+ROW_GROUP_ROWS = 128 * 1024
+# rows buffered across all partitions; many small categories would otherwise hold most of the data in memory
+MAX_PENDING_ROWS = 4 * ROW_GROUP_ROWS
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+LOW_CARDINALITY = pa.dictionary(pa.int32(), pa.string())
+
+# category_id is not stored in the files, it is the hive partition key of the directory layout
+APP_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("app_id", pa.string()),
+    ("app_name", pa.string()),
+    ("category_id", pa.int32()),
+    ("developer_id", pa.int64()),
+    ("rating", pa.float64()),
+    ("rating_count", pa.int64()),
+    ("installs", pa.int64()),
+    ("min_installs", pa.int64()),
+    ("max_installs", pa.int64()),
+    ("free", pa.bool_()),
+    ("price", pa.float64()),
+    ("currency", LOW_CARDINALITY),
+    ("size", pa.float64()),
+    ("min_android", LOW_CARDINALITY),
+    ("released", pa.date32()),
+    ("last_updated", pa.date32()),
+    ("content_rating", LOW_CARDINALITY),
+    ("ad_supported", pa.bool_()),
+    ("in_app_purchases", pa.bool_()),
+    ("editors_choice", pa.bool_()),
+    ("scraped_time", pa.timestamp("s")),
+])
+
+FILE_SCHEMA = APP_SCHEMA.remove(APP_SCHEMA.get_field_index("category_id"))
+
+
+def parquet_dir(out_dir: str) -> str:
+    return os.path.join(out_dir, PARQUET_DIR_NAME)
+
+
+def reset_parquet_dir(out_dir: str):
+    shutil.rmtree(parquet_dir(out_dir), ignore_errors=True)
+
+
+def to_arrow(apps: pd.DataFrame) -> pa.Table:
+    # accepts both the typed frames of cleaning.py and the all-text frames of the parallel merge,
+    # where an empty string is a missing value just like in the CSV output
+    columns = []
+    for field in APP_SCHEMA:
+        values = pa.array(apps[field.name], from_pandas=True)
+        if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+            values = pc.if_else(pc.equal(values, ""), pa.scalar(None, values.type), values)
+        columns.append(values.cast(field.type))
+    return pa.Table.from_arrays(columns, schema=APP_SCHEMA)
+
+
+class PartitionedParquetWriter:
+    def __init__(self, root: str, basename: str = "part-0.parquet", row_group_rows: int = ROW_GROUP_ROWS,
+                 max_pending_rows: int = MAX_PENDING_ROWS):
+        self.root = root
+        self.basename = basename
+        self.row_group_rows = row_group_rows
+        self.max_pending_rows = max_pending_rows
+        self._writers = {}
+        self._pending = {}
+        self._pending_rows = {}
+
+    def write(self, apps: pd.DataFrame):
+        table = to_arrow(apps)
+        categories = table["category_id"]
+        for category_id in pc.unique(categories).to_pylist():
+            mask = pc.is_null(categories) if category_id is None else pc.equal(categories, category_id)
+            part = table.filter(mask).drop_columns(["category_id"])
+            self._pending.setdefault(category_id, []).append(part)
+            self._pending_rows[category_id] = self._pending_rows.get(category_id, 0) + len(part)
+            if self._pending_rows[category_id] >= self.row_group_rows:
+                self._flush(category_id)
+        # over the cap, the largest buffers are written as smaller row groups
+        while sum(self._pending_rows.values()) > self.max_pending_rows:
+            self._flush(max(self._pending_rows, key=self._pending_rows.get))
+
+    def _flush(self, category_id):
+        pending = self._pending.pop(category_id, [])
+        self._pending_rows.pop(category_id, None)
+        if not pending:
+            return
+        writer = self._writers.get(category_id)
+        if writer is None:
+            partition = NULL_PARTITION if category_id is None else str(category_id)
+            directory = os.path.join(self.root, f"category_id={partition}")
+            os.makedirs(directory, exist_ok=True)
+            writer = self._writers[category_id] = pq.ParquetWriter(
+                os.path.join(directory, self.basename), FILE_SCHEMA, compression="zstd", use_dictionary=True
+            )
+        writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_rows)
+
+    def close(self):
+        for category_id in list(self._pending):
+            self._flush(category_id)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the pipeline modules import each other by bare name, as they are run from pipeline/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import csv
+import random
+
+import pandas as pd
+import pytest
+
+from cleaning import RAW_DTYPES, clean, output_paths
+from parallel import clean_parallel, find_shard_ranges, read_shard_chunks
+
+CATEGORIES = ["Tools", "Education", "Music & Audio", "Games, Puzzle", "Health & Fitness"]
+SIZES = ["10M", "500k", "1.5G", "1,018k", "8.7M", "Varies with device", "0"]
+INSTALLS = [0, 10, 500, 1000, 50000, 1000000]
+MONTHS = ["Jan", "Feb", "Mar", "Jun", "Sep", "Dec"]
+
+
+def app_name(rng: random.Random, index: int) -> str:
+    # quoted fields with separators, quotes and line breaks are what shard boundaries must not split
+    return rng.choice([
+        f"App {index}",
+        f"Notes, Lists & More {index}",
+        f'The "Best" Timer {index}',
+        f"Two-line\nname {index}",
+        f"Joe's Pizza {index}",
+        f"Ünïcödé 名前 {index}",
+    ])
+
+
+def maybe(rng: random.Random, value: str, missing: float = 0.05) -> str:
+    return "" if rng.random() < missing else value
+
+
+def raw_row(rng: random.Random, index: int, developers: list) -> list:
+    developer, email = rng.choice(developers)
+    installs = rng.choice(INSTALLS)
+    date = f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(2010, 2021)}"
+    values = {
+        "App Name": maybe(rng, app_name(rng, index), 0.02),
+        "App Id": f"com.example.app{index}",
+        "Category": maybe(rng, rng.choice(CATEGORIES), 0.02),
+        "Rating": maybe(rng, str(rng.choice([0.0, 3.5, 4.1, 4.25, 5.0])), 0.1),
+        "Rating Count": maybe(rng, f"{rng.randint(0, 10000)}.0", 0.1),
+        "Installs": maybe(rng, f"{installs:,}+", 0.02),
+        "Minimum Installs": maybe(rng, f"{installs}.0", 0.02),
+        "Maximum Installs": str(installs * rng.randint(1, 5)),
+        "Free": rng.choice(["True", "False"]),
+        "Price": rng.choice(["0.0", "0.99", "4.49"]),
+        "Currency": maybe(rng, "USD"),
+        "Size": maybe(rng, rng.choice(SIZES), 0.02),
+        "Minimum Android": maybe(rng, rng.choice(["4.1 and up", "5.0 and up", "Varies with device"]), 0.1),
+        "Developer Id": maybe(rng, developer, 0.02),
+        "Developer Email": maybe(rng, email, 0.02),
+        "Released": maybe(rng, date, 0.1),
+        "Last Updated": maybe(rng, date),
+        "Content Rating": rng.choice(["Everyone", "Teen", "Mature 17+"]),
+        "Ad Supported": rng.choice(["True", "False"]),
+        "In App Purchases": rng.choice(["True", "False"]),
+        "Editors Choice": rng.choice(["True", "False"]),
+        "Scraped Time": f"2021-06-{rng.randint(10, 16)} {rng.randint(0, 23):02d}:19:35",
+    }
+    return [values[column] for column in RAW_DTYPES]
+
+
+@pytest.fixture(scope="module")
+def raw_path(tmp_path_factory):
+    rng = random.Random(5)
+    developers = [(f"Studio {index}" + (", Inc." if index % 7 == 0 else ""), f"dev{index}@example.com")
+                  for index in range(120)]
+    path = tmp_path_factory.mktemp("raw") / "Google-Playstore.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(list(RAW_DTYPES))
+        for index in range(3000):
+            writer.writerow(raw_row(rng, index, developers))
+    return str(path)
+
+
+def read_outputs(out_dir) -> dict:
+    paths = output_paths(str(out_dir))
+    return {name: open(path, "rb").read() for name, path in paths.items()}
+
+
+def test_shards_start_on_record_boundaries(raw_path):
+    ranges = find_shard_ranges(raw_path, 7)
+    assert len(ranges) == 7
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    names = [pd.concat(read_shard_chunks(raw_path, start, end, 100))["App Id"] for start, end in ranges]
+    assert pd.concat(names).tolist() == [f"com.example.app{index}" for index in range(3000)]
+
+
+@pytest.mark.parametrize("escape_quotes", [False, True])
+def test_parallel_output_matches_single_process(raw_path, tmp_path, escape_quotes):
+    single = clean(raw_path, str(tmp_path / "single"), chunk_rows=500, escape_quotes=escape_quotes)
+    parallel = clean_parallel(raw_path, str(tmp_path / "parallel"), workers=3, chunk_rows=170,
+                              escape_quotes=escape_quotes)
+    assert parallel == single
+    assert 2500 < single["apps"] < 3000
+    expected = read_outputs(tmp_path / "single")
+    actual = read_outputs(tmp_path / "parallel")
+    for name in expected:
+        assert actual[name] == expected[name], name
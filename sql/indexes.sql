@@ -21,3 +21,11 @@ CREATE INDEX idx_apps_category_released ON apps (category_id, released);
 CREATE INDEX idx_apps_category_last_updated ON apps (category_id, last_updated);
 
 CREATE INDEX idx_apps_category_rating ON apps (category_id, rating);
+
+CREATE INDEX idx_apps_rating_id ON apps (rating, id);
+
+CREATE INDEX idx_apps_installs_id ON apps (installs, id);
+
+CREATE INDEX idx_apps_app_name_trgm ON apps USING gin (app_name gin_trgm_ops);
+
+CREATE INDEX idx_apps_app_id_trgm ON apps USING gin (app_id gin_trgm_ops);
@@ -0,0 +1,26 @@
+-- every index is created per partition; category_id leads none of them because the partition already fixes it.
+-- A unique index must contain the partition key, so these two only keep id and app_id unique within a category,
+-- and apps_default, whose category_id is NULL, is not checked at all.
+CREATE UNIQUE INDEX idx_apps_id ON apps (id, category_id);
+
+CREATE UNIQUE INDEX idx_apps_app_id ON apps (app_id, category_id);
+
+CREATE INDEX idx_apps_rating ON apps (rating);
+
+CREATE INDEX idx_apps_price ON apps (price);
+
+CREATE INDEX idx_apps_installs ON apps (installs);
+
+CREATE INDEX idx_apps_content_rating ON apps (content_rating);
+
+CREATE INDEX idx_apps_released ON apps (released);
+
+CREATE INDEX idx_apps_last_updated ON apps (last_updated);
+
+CREATE INDEX idx_apps_rating_id ON apps (rating, id);
+
+CREATE INDEX idx_apps_installs_id ON apps (installs, id);
+
+CREATE INDEX idx_apps_app_name_trgm ON apps USING gin (app_name gin_trgm_ops);
+
+CREATE INDEX idx_apps_app_id_trgm ON apps USING gin (app_id gin_trgm_ops);
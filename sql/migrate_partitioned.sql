@@ -0,0 +1,30 @@
+-- Moves an existing apps table to the layout of schema_partitioned.sql. Run with psql from this directory:
+--   psql -d playstore -f migrate_partitioned.sql
+-- The old table is kept as apps_unpartitioned; drop it once the new one is verified.
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+LOCK TABLE apps IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE apps RENAME TO apps_unpartitioned;
+ALTER INDEX apps_pkey RENAME TO apps_unpartitioned_pkey;
+ALTER INDEX apps_app_id_key RENAME TO apps_unpartitioned_app_id_key;
+DROP INDEX IF EXISTS idx_apps_category_id, idx_apps_rating, idx_apps_price, idx_apps_installs,
+    idx_apps_content_rating, idx_apps_free, idx_apps_ad_supported, idx_apps_in_app_purchases,
+    idx_apps_editors_choice, idx_apps_category_released, idx_apps_category_last_updated,
+    idx_apps_category_rating, idx_apps_rating_id, idx_apps_installs_id, idx_apps_app_name_trgm, idx_apps_app_id_trgm;
+
+\ir schema_partitioned.sql
+
+SELECT create_app_partition(id) FROM categories;
+
+INSERT INTO apps SELECT * FROM apps_unpartitioned;
+
+SELECT setval(pg_get_serial_sequence('apps', 'id'), COALESCE((SELECT MAX(id) FROM apps), 1));
+
+\ir indexes_partitioned.sql
+
+COMMIT;
+
+ANALYZE apps;
@@ -0,0 +1,9 @@
+-- Adds the rollup_version sequence of statistics.sql to a database whose rollup tables predate it, replacing the
+-- single-row rollup_version table of earlier versions
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('rollup_version')) = 'r' THEN
+        DROP TABLE rollup_version;
+    END IF;
+END $$;
+CREATE SEQUENCE IF NOT EXISTS rollup_version;
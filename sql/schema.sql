@@ -1,3 +1,6 @@
+-- trigram operators for the search indexes of indexes.sql
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 CREATE TABLE categories (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) UNIQUE NOT NULL
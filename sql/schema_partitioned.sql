@@ -0,0 +1,52 @@
+-- trigram operators for the search indexes of indexes_partitioned.sql
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- apps partitioned by LIST (category_id): one partition per category, apps without a category in apps_default.
+-- Primary and unique keys of a partitioned table must contain the partition key, and category_id is nullable,
+-- so indexes_partitioned.sql can only make (id, category_id) and (app_id, category_id) unique. The same app_id may
+-- therefore exist in two categories, and nothing is unique in apps_default. id still comes from a single sequence.
+CREATE TABLE apps (
+    id SERIAL NOT NULL,
+    app_id VARCHAR(255) NOT NULL,
+    app_name VARCHAR(255) NOT NULL,
+    category_id INT REFERENCES categories(id) ON DELETE SET NULL,
+    developer_id INT REFERENCES developers(id) ON DELETE SET NULL,
+    rating FLOAT,
+    rating_count BIGINT,
+    installs BIGINT,
+    min_installs BIGINT,
+    max_installs BIGINT,
+    free BOOLEAN,
+    price FLOAT,
+    currency VARCHAR(50),
+    size FLOAT,
+    min_android VARCHAR(50),
+    released DATE,
+    last_updated DATE,
+    content_rating VARCHAR(50),
+    ad_supported BOOLEAN,
+    in_app_purchases BOOLEAN,
+    editors_choice BOOLEAN,
+    scraped_time TIMESTAMP
+) PARTITION BY LIST (category_id);
+
+CREATE TABLE apps_default PARTITION OF apps DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_app_partition(p_category_id INT) RETURNS VOID AS $$
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF apps FOR VALUES IN (%s)',
+                   'apps_category_' || p_category_id, p_category_id);
+END;
+$$ LANGUAGE plpgsql;
+
+-- new categories get their partition before any app can reference them
+CREATE OR REPLACE FUNCTION create_app_partition_for_category() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM create_app_partition(NEW.id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER categories_create_app_partition
+    AFTER INSERT ON categories
+    FOR EACH ROW EXECUTE FUNCTION create_app_partition_for_category();
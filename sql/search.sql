@@ -0,0 +1,6 @@
+-- Adds the trigram search indexes of indexes.sql to an existing database without reloading it
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_apps_app_name_trgm ON apps USING gin (app_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_apps_app_id_trgm ON apps USING gin (app_id gin_trgm_ops);
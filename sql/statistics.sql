@@ -0,0 +1,29 @@
+CREATE TABLE app_release_stats (
+    category_id INT NOT NULL,
+    year INT NOT NULL,
+    app_count BIGINT NOT NULL,
+    PRIMARY KEY (category_id, year)
+);
+
+CREATE TABLE app_update_stats (
+    category_id INT NOT NULL,
+    year INT NOT NULL,
+    app_count BIGINT NOT NULL,
+    PRIMARY KEY (category_id, year)
+);
+
+CREATE TABLE app_rating_stats (
+    category_id INT NOT NULL,
+    rating_bucket NUMERIC(3, 1) NOT NULL,
+    app_count BIGINT NOT NULL,
+    PRIMARY KEY (category_id, rating_bucket)
+);
+
+CREATE TABLE category_rating_stats (
+    category_id INT PRIMARY KEY,
+    rating_sum DOUBLE PRECISION NOT NULL,
+    rating_count BIGINT NOT NULL
+);
+
+-- bumped after every committed rollup write, so API workers notice changes made by another process
+CREATE SEQUENCE rollup_version;